@@ -0,0 +1,65 @@
+# Compares the regex parser with the delimiter-based parser of log_parsing, from the CSV file to the cleaned DataFrame.
+#
+#   python benchmarks/parse_benchmark.py --sizes 100000,1000000,10000000
+#
+# The logs come from the seeded generator, so every run parses the same data. At 10^7 rows
+# the regex path alone needs well over 10 GB of memory.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from log_parsing import apply_log_schema, parse_csv_bytes, parse_raw_logs_regex, read_raw_logs
+from olympic_logs import write_sharded_logs
+
+# Function to time one parse of the file with each parser
+def benchmark_size(path, check):
+    started = time.perf_counter()
+    regex_data = parse_raw_logs_regex(read_raw_logs(path))
+    regex_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with open(path, 'rb') as log_file:
+        fast_data, malformed = parse_csv_bytes(log_file.read())
+    fast_seconds = time.perf_counter() - started
+
+    if check:
+        pd.testing.assert_frame_equal(apply_log_schema(regex_data.dropna().reset_index(drop=True)), fast_data, check_categorical=False)
+    return {
+        'rows': len(fast_data),
+        'malformed': len(malformed),
+        'regex_seconds': round(regex_seconds, 3),
+        'fast_seconds': round(fast_seconds, 3),
+        'speedup': round(regex_seconds / fast_seconds, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the regex and the delimiter-based log parsers")
+    parser.add_argument('--sizes', default='100000,1000000,10000000', help="comma separated row counts")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="processes used to generate the logs")
+    parser.add_argument('--no-check', dest='check', action='store_false', help="skip comparing the two outputs")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'web_logs.csv')
+            write_sharded_logs(path, datetime(2024, 5, 30), datetime(2024, 8, 30), size, args.seed, args.workers)
+            result = benchmark_size(path, args.check)
+        results.append(result)
+        print(f"{size:>10,} rows  regex {result['regex_seconds']:>8.2f}s  fast {result['fast_seconds']:>7.2f}s  {result['speedup']:>5.1f}x")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+# Times the hot paths of the project on seeded logs and records their peak memory:
+# generating logs, serving /generate-logs, fetching into the store, loading and cleaning, and the
+# aggregations behind the dashboard and the EDA page, without rendering anything with Streamlit.
+#
+#   python benchmarks/run_benchmarks.py --sizes 10000,100000,1000000 --output results.json
+#   python benchmarks/run_benchmarks.py --compare results.json
+#
+# The logs come from the seeded generator, so runs on different commits measure the same data and the
+# JSON files they write can be compared with --compare. Peak memory is measured by tracemalloc in a
+# second run of each stage, it covers Python and NumPy allocations but not Arrow buffers, nor the
+# processes parsing large files in load_and_clean_data. The stages going through the Python generator
+# and the API build a whole batch in memory and slow down a lot at 10^7 rows, leave them out there
+# with --stages.
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from werkzeug.serving import make_server
+import streamlit_app
+import fetch_data
+from log_aggregates import AggregateLogCache
+from log_parsing import enrich_logs, parse_csv_bytes
+from log_queries import slice_logs
+from log_rollup import RollupLogCache, filter_rollup
+from log_sketches import read_sketches, write_sketches
+from log_sqlite import write_sqlite_store
+from log_store import write_parquet_store
+from olympic_logs import app, generate_raw_logs, generate_raw_logs_vectorized, write_sharded_logs
+
+start_date = datetime(2024, 5, 30)
+end_date = datetime(2024, 8, 30)
+
+stage_names = ['generate_raw_logs', 'generate_raw_logs_vectorized', 'generate-logs', 'update_csv',
+               'load_and_clean_data', 'load_and_clean_data_serial', 'load_and_clean_data_parquet', 'load_and_clean_data_chunked', 'dashboard_page', 'perform_eda',
+               'dashboard_page_sqlite', 'perform_eda_sqlite', 'dashboard_page_sketches', 'perform_eda_chunked']
+
+# Function to time one call of run, then measure its peak memory in a second call.
+# setup runs before each call and is left out of both
+def measure(run, setup=None, memory=True):
+    if setup:
+        setup()
+    gc.collect()
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+# Function to return the builders of every figure and metric of the dashboard, by panel,
+# answered from the sketches where the approximate mode would when they are given
+def dashboard_panels(filtered_data, filtered_rollup, sketches=None):
+    panels = {
+        'metrics': lambda: streamlit_app.dashboard_metrics(filtered_data, filtered_rollup, sketches),
+        'browser': lambda: streamlit_app.count_chart(filtered_data, 'Browser'),
+        'device': lambda: streamlit_app.count_chart(filtered_data, 'Device'),
+        'traffic sources': lambda: streamlit_app.traffic_sources_chart(filtered_rollup),
+        'errors': lambda: streamlit_app.error_chart(filtered_rollup),
+        'response sizes': lambda: streamlit_app.response_size_chart(filtered_data, sketches),
+        'top pages': lambda: streamlit_app.top_pages_chart(filtered_rollup, sketches),
+        'interactions': lambda: streamlit_app.interactions_chart(filtered_data),
+        'top sports': lambda: streamlit_app.top_sports_chart(filtered_data, sketches),
+        'countries': lambda: streamlit_app.country_chart(filtered_rollup, False, sketches),
+        'countries by hour': lambda: streamlit_app.country_chart(filtered_rollup, True),
+    }
+    for option, analysis in streamlit_app.traffic_analyses.items():
+        panels[option] = lambda analysis=analysis: analysis(filtered_rollup)
+    if sketches is not None:
+        panels['quantiles'] = lambda: streamlit_app.quantile_table(sketches)
+    return panels
+
+# Function to filter the logs to the whole generated range and build every panel, like dashboard_page does.
+# With a sketch store, the sketches of the range are merged and the approximate panels built from them
+def build_dashboard(cleaned_data, rollup, sketch_store=None):
+    filtered_data = slice_logs(cleaned_data, start_date, end_date)
+    filtered_rollup = filter_rollup(rollup, start_date, end_date)
+    sketches = read_sketches(sketch_store, start_date, end_date) if sketch_store else None
+    return {panel: build() for panel, build in dashboard_panels(filtered_data, filtered_rollup, sketches).items()}
+
+# Function to serve the generator API on a free local port for the duration of the block
+@contextlib.contextmanager
+def stand_in_server():
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no line per request
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.port}'
+    finally:
+        server.shutdown()
+        thread.join()
+
+# Function to run the selected stages on size seeded logs
+def benchmark_size(size, seed, stages, directory, memory, workers, chunk_bytes):
+    path = os.path.join(directory, 'web_logs.csv')
+    write_sharded_logs(path, start_date, end_date, size, seed, workers)
+    results = []
+
+    def record(stage, run, setup=None):
+        if stage.split('/')[0] not in stages:
+            return
+        seconds, peak = measure(run, setup, memory)
+        result = {'stage': stage, 'rows': size, 'seconds': round(seconds, 4), 'peak_bytes': peak}
+        results.append(result)
+        peak_text = f'{peak / 2 ** 20:>9.1f} MB' if peak is not None else ''
+        print(f"{size:>10,} rows  {stage:<36} {seconds:>9.3f}s{peak_text}")
+
+    record('generate_raw_logs', lambda: generate_raw_logs(start_date, end_date, size), setup=lambda: random.seed(seed))
+    record('generate_raw_logs_vectorized', lambda: generate_raw_logs_vectorized(start_date, end_date, size, np.random.default_rng(seed)))
+
+    # Same request as fetch_data sends, with a gzip-encoded response
+    flask_client = app.test_client()
+    record('generate-logs', lambda: flask_client.get('/generate-logs', query_string={'count': size}, headers={'Accept-Encoding': 'gzip'}).get_data(),
+           setup=lambda: random.seed(seed))
+    # The same logs as Arrow record batches, uncompressed as fetch_data asks for them
+    record('generate-logs/arrow', lambda: flask_client.get('/generate-logs/arrow', query_string={'count': size}).get_data())
+
+    # One fetch of size logs from a local generator into a fresh CSV file, Parquet store, rollup and sketch store
+    fetch_directory = os.path.join(directory, 'fetch')
+    def reset_fetch():
+        shutil.rmtree(fetch_directory, ignore_errors=True)
+        os.makedirs(fetch_directory)
+        random.seed(seed)
+    def fetch(transport='json'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            fetch_data.update_csv(count=size, interval=0, transport=transport)
+    if 'update_csv' in stages:
+        with stand_in_server() as url:
+            saved = (fetch_data.client, fetch_data.csv_file, fetch_data.parquet_store, fetch_data.rollup_store, fetch_data.sketch_store)
+            fetch_data.client = fetch_data.LogApiClient([url])
+            fetch_data.csv_file = os.path.join(fetch_directory, 'web_logs.csv')
+            fetch_data.parquet_store = os.path.join(fetch_directory, 'web_logs_parquet')
+            fetch_data.rollup_store = os.path.join(fetch_directory, 'web_logs_rollup')
+            fetch_data.sketch_store = os.path.join(fetch_directory, 'web_logs_sketches')
+            try:
+                record('update_csv', fetch, setup=reset_fetch)
+                # Arrow batches written to the stores only, the CSV file is left out
+                record('update_csv/arrow', lambda: fetch('arrow'), setup=reset_fetch)
+            finally:
+                fetch_data.client, fetch_data.csv_file, fetch_data.parquet_store, fetch_data.rollup_store, fetch_data.sketch_store = saved
+
+    # Cold loads: the parse cache is emptied first so every row is parsed
+    record('load_and_clean_data', lambda: streamlit_app.load_and_clean_data(path), setup=streamlit_app.log_cache.clear)
+    # The same load parsed in this process only, to compare with the parse workers
+    record('load_and_clean_data_serial', lambda: RollupLogCache(1).load(path))
+
+    store = os.path.join(directory, 'web_logs_parquet')
+    if 'load_and_clean_data_parquet' in stages:
+        with open(path, 'rb') as log_file:
+            write_parquet_store(enrich_logs(parse_csv_bytes(log_file.read())[0]), store)
+        record('load_and_clean_data_parquet', lambda: streamlit_app.load_and_clean_data(store))
+
+    # Reading chunk_bytes at a time into running aggregates, from a fresh cache every time
+    record('load_and_clean_data_chunked', lambda: AggregateLogCache(chunk_bytes).load(path))
+
+    if 'dashboard_page' in stages or 'perform_eda' in stages or 'dashboard_page_sketches' in stages:
+        streamlit_app.log_cache.clear()
+        cleaned_data = streamlit_app.load_and_clean_data(path)
+        rollup = streamlit_app.load_rollup(path)
+        record('dashboard_page', lambda: build_dashboard(cleaned_data, rollup))
+        panels = dashboard_panels(slice_logs(cleaned_data, start_date, end_date), filter_rollup(rollup, start_date, end_date))
+        for panel, build in panels.items():
+            record(f'dashboard_page/{panel}', build)
+        record('perform_eda', lambda: streamlit_app.eda_statistics(cleaned_data, rollup))
+
+        # The approximate mode, merging the sketches of every day as written by one fetch
+        sketch_store = os.path.join(directory, 'web_logs_sketches')
+        if 'dashboard_page_sketches' in stages:
+            write_sketches(cleaned_data, sketch_store)
+            record('dashboard_page_sketches', lambda: build_dashboard(cleaned_data, rollup, sketch_store))
+
+    # The same aggregations pushed down to the SQLite store, the rollup included since it is queried on every run
+    if 'dashboard_page_sqlite' in stages or 'perform_eda_sqlite' in stages:
+        database = os.path.join(directory, 'web_logs.db')
+        with open(path, 'rb') as log_file:
+            write_sqlite_store(enrich_logs(parse_csv_bytes(log_file.read())[0]), database)
+        logs = streamlit_app.load_and_clean_data(database)
+        record('dashboard_page_sqlite', lambda: build_dashboard(logs, streamlit_app.load_rollup(database)))
+        record('perform_eda_sqlite', lambda: streamlit_app.eda_statistics(logs, streamlit_app.load_rollup(database)))
+
+    # The EDA tables from the aggregates, quartiles of times included, which read the file a second time
+    if 'perform_eda_chunked' in stages:
+        aggregate_cache = AggregateLogCache(chunk_bytes)
+        aggregates = aggregate_cache.load(path)
+        record('perform_eda_chunked', lambda: streamlit_app.eda_statistics(aggregates.copy(), aggregate_cache.rollup()))
+    return results
+
+# Function to print how much slower or faster each stage got since an earlier run
+def compare(results, previous):
+    earlier = {(result['stage'], result['rows']): result for result in previous['results']}
+    print(f"\nCompared with {previous.get('commit') or 'the earlier run'}:")
+    for result in results:
+        before = earlier.get((result['stage'], result['rows']))
+        if before and before['seconds']:
+            print(f"{result['rows']:>10,} rows  {result['stage']:<36} {result['seconds'] / before['seconds']:>8.2f}x time")
+
+# Function to return the commit being benchmarked, None outside a git checkout
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark log generation, ingestion, parsing and the dashboard aggregations")
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="comma separated row counts")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', default=','.join(stage_names), help=f"comma separated stages out of {', '.join(stage_names)}")
+    parser.add_argument('--workers', type=int, default=None, help="processes used to generate the logs")
+    parser.add_argument('--parse-workers', type=int, default=None, help="processes parsing the CSV file in load_and_clean_data, defaults to the number of CPUs")
+    parser.add_argument('--chunk-bytes', type=int, default=16 * 1024 * 1024, help="bytes read at a time by the chunked stages")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="skip the tracemalloc run of each stage")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON file of an earlier run to compare the timings with")
+    args = parser.parse_args(argv)
+
+    stages = args.stages.split(',')
+    unknown = set(stages) - set(stage_names)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    streamlit_app.parse_workers = args.parse_workers
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as directory:
+            results.extend(benchmark_size(size, args.seed, stages, directory, args.memory, args.workers, args.chunk_bytes))
+
+    run = {
+        'commit': current_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'seed': args.seed,
+        'parse_workers': args.parse_workers or os.cpu_count(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(run, output, indent=2)
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Most points a line chart is drawn with, set OLYMPIC_CHART_POINTS to change it
+chart_points = int(os.environ.get("OLYMPIC_CHART_POINTS", 1000))
+
+# Function to count values into equal-width bins, like a histogram drawn in the browser would.
+# Returns one row per bin with its center, edges and count
+def histogram_bins(values, nbins=50):
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return pd.DataFrame({'center': [], 'left': [], 'right': [], 'count': []})
+    counts, edges = np.histogram(values, bins=nbins)
+    return pd.DataFrame({'center': (edges[:-1] + edges[1:]) / 2, 'left': edges[:-1], 'right': edges[1:], 'count': counts})
+
+# Function to pick the positions of at most `points` points of a line that keep its shape, with
+# Largest-Triangle-Three-Buckets: the first and last points are kept, and from each bucket in between
+# the point making the largest triangle with the point kept before it and the average of the next bucket
+def lttb_indices(x, y, points):
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x).astype('float64')
+    y = np.asarray(y, dtype='float64')
+
+    # Bucket boundaries over the points between the first and the last one
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    kept = np.empty(points, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+# Function to downsample a frame holding a line, sorted by `x`, to at most `points` rows.
+# With `by`, every line of the frame is downsampled on its own
+def downsample(frame, x, y, points=None, by=None):
+    points = points or chart_points
+    if by is not None:
+        return pd.concat([downsample(group, x, y, points) for _, group in frame.groupby(by, observed=True, sort=False)], ignore_index=True) if len(frame) else frame
+    if len(frame) <= points:
+        return frame
+    # Dates and times are measured in nanoseconds
+    x_values = frame[x] if pd.api.types.is_numeric_dtype(frame[x]) else pd.to_datetime(frame[x]).to_numpy().view('int64')
+    return frame.iloc[lttb_indices(x_values, frame[y].to_numpy(), points)]
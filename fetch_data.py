@@ -1,73 +1,249 @@
-import requests
-import csv
-import pandas as pd
-import time
-import random
-
-csv_file = "web_logs.csv"
-
-# Function to fetch data from the API
-def fetch_raw_data_from_api(count=None):
-    api_url = "http://127.0.0.1:5000/generate-logs"
-    
-    # If count is provided, append it to the URL as a query parameter
-    if count is not None:
-        api_url += f"?count={count}"
-    
-    print(f"Fetching data from API with count: {count}")  # Debugging print statement
-    
-    response = requests.get(api_url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        print(f"Received {len(data)} logs from the API")  # Debugging print statement
-        return data
-    else:
-        print("Error: Failed to retrieve data from the API")
-        return None
-
-# Function to save data to a CSV file
-def save_raw_to_csv(raw_data):
-    if raw_data:
-        with open(csv_file, "a", newline="") as csvfile: # appends new logs to the csv file
-            writer = csv.writer(csvfile)
-            for raw_log in raw_data:
-                writer.writerow([raw_log])
-        print(f"Raw data saved to CSV file: {csv_file}")
-    else:
-        print("No raw data to save.")
-
-# Function to update CSV file periodically
-def update_csv(iterations=1):
-    for _ in range(iterations):
-        # Simulating variable number of logs fetched
-        new_logs_count = random.randint(300, 5000)  # Simulate between 300 to 5000 logs fetched
-        
-        # Fetch new data from the API with the specified count
-        raw_data = fetch_raw_data_from_api(count=new_logs_count)
-        
-        if raw_data:
-            # Convert fetched raw data to DataFrame
-            new_data = pd.DataFrame(raw_data, columns=["log"])
-
-            # Load existing data
-            try:
-                existing_data = pd.read_csv(csv_file, header=None, names=["log"])
-            except FileNotFoundError:
-                existing_data = pd.DataFrame(columns=["log"])
-
-            # Append new data to existing data
-            updated_data = pd.concat([existing_data, new_data])
-
-            # Save updated data back to the CSV file
-            updated_data.to_csv(csv_file, index=False, header=False)
-
-            print(f"Updated CSV file with {len(new_data)} new entries.")
-
-        # Wait for 60 seconds before fetching new data again
-        time.sleep(60)
-
-if __name__ == "__main__":
-    # Start updating the CSV file
-    while True:
-        update_csv()
+import requests
+import os
+import pyarrow as pa
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from instrumentation import collect_timings, timed
+from log_parsing import enrich_logs, logs_from_arrow, parse_raw_logs
+from log_rollup import compact_rollup, write_rollup
+from log_sketches import compact_sketches, write_sketches
+from log_sqlite import write_sqlite_store
+from log_store import append_logs, compact_parquet_store, write_parquet_store
+
+csv_file = "web_logs.csv"
+rotate_bytes = None  # e.g. 512 * 1024 * 1024 to start a new segment once the file reaches 512 MB
+parquet_store = "web_logs_parquet"  # day-partitioned typed copy of the logs, None to only write the CSV
+rollup_store = "web_logs_rollup"  # hourly pre-aggregated counts of the logs, None to not keep them
+sketch_store = "web_logs_sketches"  # daily sketches for the dashboard's approximate mode, None to not keep them
+sqlite_store = None  # e.g. "web_logs.db" to also keep the parsed logs in an indexed SQLite database
+# "arrow" fetches typed Arrow record batches, which are written to the stores above without a CSV line;
+# "json" fetches the formatted log lines, appended to the CSV file as well
+transport = "json"
+
+# Generator nodes to pull from, comma separated
+api_urls = os.environ.get("OLYMPIC_API_URLS", "http://127.0.0.1:5000").split(",")
+
+# Client keeping one pooled, retrying session for every poll
+class LogApiClient:
+    def __init__(self, base_urls=api_urls, timeout=(3.05, 60), retries=5, backoff_factor=0.5, pool_size=10):
+        self.base_urls = [base_url.rstrip("/") for base_url in base_urls]
+        self.timeout = timeout  # (connect, read) seconds
+
+        # Retries back off exponentially: backoff_factor * 2 ** (attempt - 1) seconds
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["GET"]))
+        adapter = HTTPAdapter(pool_connections=len(self.base_urls), pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+
+    # Function to fetch one batch from one generator node
+    def fetch(self, base_url, count=None):
+        params = {} if count is None else {"count": count}
+        print(f"Fetching data from {base_url} with count: {count}")  # Debugging print statement
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{base_url}/generate-logs", params=params, timeout=self.timeout)
+            response.raise_for_status()
+            # A truncated or invalid body is skipped like a failed request
+            data = response.json()
+        except (requests.RequestException, ValueError) as error:
+            print(f"Error: Failed to retrieve data from {base_url}: {error}")
+            return None
+        print(f"Received {len(data)} logs from {base_url} in {time.perf_counter() - started:.2f}s")  # Debugging print statement
+        return data
+
+    # Function to fetch one batch from one generator node as Arrow record batches, in a table. compression
+    # ('zstd' or 'lz4') trades a decompression copy of every buffer for fewer bytes on the wire
+    def fetch_arrow(self, base_url, count=None, compression=None):
+        params = {} if count is None else {"count": count}
+        if compression:
+            params["compression"] = compression
+        print(f"Fetching Arrow batches from {base_url} with count: {count}")  # Debugging print statement
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{base_url}/generate-logs/arrow", params=params, timeout=self.timeout)
+            response.raise_for_status()
+            # The batches are read in place from the body: uncompressed, their columns point into it
+            table = pa.ipc.open_stream(pa.py_buffer(response.content)).read_all()
+        except (requests.RequestException, pa.ArrowInvalid) as error:
+            print(f"Error: Failed to retrieve Arrow batches from {base_url}: {error}")
+            return None
+        print(f"Received {table.num_rows} logs from {base_url} in {time.perf_counter() - started:.2f}s")  # Debugging print statement
+        return table
+
+    # Function to fetch a batch from every generator node concurrently, merged in node order
+    def fetch_all(self, count=None):
+        with ThreadPoolExecutor(max_workers=len(self.base_urls)) as executor:
+            batches = list(executor.map(lambda base_url: self.fetch(base_url, count), self.base_urls))
+        if all(batch is None for batch in batches):
+            return None
+        return [raw_log for batch in batches if batch for raw_log in batch]
+
+    # Function to fetch Arrow batches from every generator node concurrently, one table in node order
+    def fetch_all_arrow(self, count=None):
+        with ThreadPoolExecutor(max_workers=len(self.base_urls)) as executor:
+            tables = list(executor.map(lambda base_url: self.fetch_arrow(base_url, count), self.base_urls))
+        if all(table is None for table in tables):
+            return None
+        return pa.concat_tables(table for table in tables if table is not None)
+
+    # Function to stream logs from one generator node into the CSV file as they arrive
+    def stream_to_csv(self, base_url, count=None, chunk_size=10000, gzip=False, rotate_bytes=rotate_bytes):
+        params = {"chunk_size": chunk_size}
+        if count is not None:
+            params["count"] = count
+        if gzip:
+            params["gzip"] = 1
+
+        print(f"Streaming data from {base_url} with count: {count}")  # Debugging print statement
+
+        saved = 0
+        try:
+            with self.session.get(f"{base_url}/generate-logs/stream", params=params, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+
+                pending = ""  # partial line carried over to the next chunk
+                raw_logs = []
+                # requests undoes the gzip Content-Encoding while iterating
+                for chunk in response.iter_content(chunk_size=65536, decode_unicode=True):
+                    lines = (pending + chunk).split("\n")
+                    pending = lines.pop()
+                    raw_logs.extend(raw_log for raw_log in lines if raw_log)
+                    # Write whenever a full chunk of logs has arrived
+                    if len(raw_logs) >= chunk_size:
+                        store_raw_logs(raw_logs, rotate_bytes)
+                        saved += len(raw_logs)
+                        raw_logs = []
+                if pending:
+                    raw_logs.append(pending)
+                store_raw_logs(raw_logs, rotate_bytes)
+                saved += len(raw_logs)
+        except requests.RequestException as error:
+            print(f"Error: Failed to stream data from {base_url}: {error}")
+
+        print(f"Streamed {saved} logs from {base_url} to CSV file: {csv_file}")
+        return saved
+
+    # Function to stream from every generator node concurrently
+    def stream_all_to_csv(self, count=None, chunk_size=10000, gzip=False, rotate_bytes=rotate_bytes):
+        with ThreadPoolExecutor(max_workers=len(self.base_urls)) as executor:
+            return sum(executor.map(lambda base_url: self.stream_to_csv(base_url, count, chunk_size, gzip, rotate_bytes), self.base_urls))
+
+client = LogApiClient()
+
+# Function to fetch data from the API
+def fetch_raw_data_from_api(count=None):
+    return client.fetch_all(count)
+
+# Function to fetch typed logs from the API as an Arrow table
+def fetch_arrow_from_api(count=None):
+    return client.fetch_all_arrow(count)
+
+# Function to stream logs from the API into the CSV file as they arrive
+def stream_raw_data_to_csv(count=None, chunk_size=10000, gzip=False, rotate_bytes=rotate_bytes):
+    return client.stream_all_to_csv(count, chunk_size, gzip, rotate_bytes)
+
+# Function to write a batch of raw logs to the CSV file, the Parquet store, the rollup, the sketches and the SQLite store
+def store_raw_logs(raw_logs, rotate_bytes=rotate_bytes):
+    with timed('write csv'):
+        append_logs(raw_logs, csv_file, rotate_bytes)
+    if (parquet_store or rollup_store or sketch_store or sqlite_store) and raw_logs:
+        # Lines that do not parse are kept in the CSV but left out of the typed store, which also holds the derived columns
+        with timed('parse'):
+            cleaned_data, malformed = parse_raw_logs(raw_logs)
+        if len(malformed):
+            print(f"Skipped {len(malformed)} malformed logs, first one: {malformed.iloc[0]}")
+        with timed('enrich'):
+            cleaned_data = enrich_logs(cleaned_data)
+        store_logs(cleaned_data)
+
+# Function to write a batch of parsed and enriched logs to the Parquet store, the rollup, the sketches and the SQLite store
+def store_logs(cleaned_data):
+    if parquet_store:
+        with timed('write parquet'):
+            write_parquet_store(cleaned_data, parquet_store)
+    # Only the counts of this batch are written, the rollup adds them up when it is read
+    if rollup_store:
+        with timed('write rollup'):
+            write_rollup(cleaned_data, rollup_store)
+    # Sketches of this batch too, merged with the others of the same day when read
+    if sketch_store:
+        with timed('write sketches'):
+            write_sketches(cleaned_data, sketch_store)
+    if sqlite_store:
+        with timed('write sqlite'):
+            write_sqlite_store(cleaned_data, sqlite_store)
+
+# Function to save data to a CSV file
+def save_raw_to_csv(raw_data, rotate_bytes=rotate_bytes):
+    if raw_data:
+        store_raw_logs(raw_data, rotate_bytes)  # appends new logs to the csv file
+        print(f"Raw data saved to CSV file: {csv_file}")
+    else:
+        print("No raw data to save.")
+
+# Function to update CSV file periodically. count fixes the size of each batch, which is random otherwise
+def update_csv(iterations=1, stream=False, rotate_bytes=rotate_bytes, count=None, interval=60, transport=transport):
+    if transport == "arrow" and not (parquet_store or rollup_store or sketch_store or sqlite_store):
+        raise ValueError("Arrow batches are only written to the Parquet, rollup, sketch and SQLite stores, set one of them")
+    for _ in range(iterations):
+        # Simulating variable number of logs fetched
+        new_logs_count = count or random.randint(300, 5000)  # Simulate between 300 to 5000 logs fetched
+
+        if stream:
+            # Streamed logs are appended chunk by chunk, no full batch in memory
+            started = time.perf_counter()
+            stream_raw_data_to_csv(count=new_logs_count, gzip=True, rotate_bytes=rotate_bytes)
+            print(f"Streamed for {time.perf_counter() - started:.2f}s")
+            time.sleep(interval)
+            continue
+
+        if transport == "arrow":
+            # The typed columns go straight to the stores: no line is formatted, appended or parsed
+            with collect_timings() as timings:
+                with timed('fetch'):
+                    table = fetch_arrow_from_api(count=new_logs_count)
+                if table is not None and table.num_rows:
+                    with timed('decode'):
+                        cleaned_data = logs_from_arrow(table)
+                    with timed('enrich'):
+                        cleaned_data = enrich_logs(cleaned_data)
+                    store_logs(cleaned_data)
+            if table is not None and table.num_rows:
+                print(f"Stored {table.num_rows} new entries from Arrow batches. Took {timings.summary()}")
+            time.sleep(interval)
+            continue
+        
+        # Fetch and write durations of this batch
+        with collect_timings() as timings:
+            # Fetch new data from the API with the specified count
+            with timed('fetch'):
+                raw_data = fetch_raw_data_from_api(count=new_logs_count)
+            
+            if raw_data:
+                # Append only the new batch, the existing history is left untouched
+                store_raw_logs(raw_data, rotate_bytes)
+
+        if raw_data:
+            print(f"Updated CSV file with {len(raw_data)} new entries. Took {timings.summary()}")
+
+        # Wait interval seconds (60 by default) before fetching new data again
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    # Start updating the CSV file
+    cycles = 0
+    while True:
+        update_csv()
+        cycles += 1
+        # Merge the small per-batch Parquet files about once an hour
+        if parquet_store and cycles % 60 == 0:
+            compact_parquet_store(parquet_store)
+        if rollup_store and cycles % 60 == 0:
+            compact_rollup(rollup_store)
+        if sketch_store and cycles % 60 == 0:
+            compact_sketches(sketch_store)
@@ -0,0 +1,101 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Stage timings being collected by each thread, a Streamlit run or a fetch cycle
+_collecting = threading.local()
+
+# Seconds spent in each stage of a run, by stage name in the order the stages first ran
+class StageTimings:
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    # Function to format the timings as "stage 0.12s" pairs, for print-based logs
+    def summary(self):
+        return ', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in self.seconds.items())
+
+# Function to collect the stages timed by this thread during the block
+@contextmanager
+def collect_timings():
+    previous = getattr(_collecting, 'timings', None)
+    _collecting.timings = timings = StageTimings()
+    try:
+        yield timings
+    finally:
+        _collecting.timings = previous
+
+# Function to time a block as a stage of the timings this thread is collecting. Outside of
+# collect_timings it does nothing, so the hot paths can stay instrumented at no cost
+@contextmanager
+def timed(stage):
+    timings = getattr(_collecting, 'timings', None)
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - started)
+
+# Upper bounds of the latency histogram buckets, in seconds
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Counters and histograms rendered in the Prometheus text format. Samples are keyed by name and labels
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.descriptions = {}  # name: (type, help)
+        self.counters = {}  # (name, labels): value
+        self.histograms = {}  # (name, labels): [count per bucket, sum, count]
+
+    def describe(self, name, kind, help_text):
+        self.descriptions[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            sample = self.histograms.setdefault(key, [[0] * len(latency_buckets), 0.0, 0])
+            bucket = bisect_left(latency_buckets, value)
+            if bucket < len(latency_buckets):
+                sample[0][bucket] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    # Function to write every sample in the Prometheus text exposition format
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (kind, help_text) in self.descriptions.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (sample_name, labels), value in self.counters.items():
+                    if sample_name == name:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+                for (sample_name, labels), (buckets, total, count) in self.histograms.items():
+                    if sample_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(latency_buckets, buckets):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {total}')
+                    lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+# Function to format labels as {name="value",...}, nothing when there are none
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
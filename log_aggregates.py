@@ -0,0 +1,348 @@
+import copy
+import os
+import threading
+import numpy as np
+import pandas as pd
+from instrumentation import timed
+from log_parsing import concat_log_frames, derived_columns, empty_log_frame, enrich_logs, log_columns, parse_csv_bytes, sort_by_time, time_slice
+from log_rollup import build_rollup, merge_rollups
+from log_sqlite import describe_counts, describe_frame, describe_seconds, time_columns
+from log_store import log_segments
+
+# Running aggregates of logs too large to hold in memory. The CSV file is read chunk_bytes at a time and
+# each chunk, once parsed and enriched, is folded into counts whose size depends on the days and the
+# distinct values of the logs, not on their number: so is the peak memory of a load, set by the chunk size.
+# The aggregates answer the same questions as the logs through log_queries, with the same results
+
+# Columns counted for each day, by column: the columns their counts are split by as well, for the
+# questions asked about a single section. Times are counted by the minute
+counted_columns = {
+    'Section': [],
+    'Request': ['Section'],
+    'Sports Event': [],
+    'Interaction': [],
+    'Live Stream Sport': ['Section'],
+    'Browser': [],
+    'Device': [],
+    'Status Code': [],
+    'Response Size': [],
+    'Session Duration': [],
+    'Timestamp Start': [],
+    'Timestamp End': [],
+}
+
+# Columns summarized by describe, the numeric and time columns DataFrame.describe would summarize but the
+# IP addresses, which are not counted
+described_columns = time_columns + ['Status Code', 'Response Size', 'Session Duration']
+
+# How the figures kept for each day add up across chunks: the number of logs, and the sum, minimum and
+# maximum of each time in seconds
+day_aggregations = {'count': 'sum', **{f'{column} {statistic}': statistic for column in time_columns for statistic in ('sum', 'min', 'max')}}
+
+# Earliest logs kept for each day, enough for the first rows the dashboard shows
+head_rows = 5
+
+# Function to read the logs of a file from byte `start` up to byte `end`, or its current end, chunk_bytes
+# at a time. Yields each chunk's parsed and enriched logs, its malformed lines and the offset after it.
+# Only complete lines are read, a line still being written is left for the next read
+def read_log_chunks(path, chunk_bytes, start=0, end=None):
+    with open(path, 'rb') as log_file:
+        log_file.seek(start)
+        offset, pending = start, b''
+        while end is None or offset + len(pending) < end:
+            with timed('read'):
+                block = log_file.read(chunk_bytes if end is None else min(chunk_bytes, end - offset - len(pending)))
+            if not block:
+                return
+            block = pending + block
+            cut = block.rfind(b'\n') + 1
+            block, pending = block[:cut], block[cut:]
+            if not block:
+                continue  # a line longer than chunk_bytes, read on
+            with timed('parse'):
+                cleaned_data, malformed = parse_csv_bytes(block)
+            with timed('enrich'):
+                cleaned_data = enrich_logs(cleaned_data)
+            offset += len(block)
+            yield cleaned_data, malformed, offset
+
+# Function to count enriched logs by their day, a 'Day' series, the split columns and the value of a column, with the sum of
+# their session durations. Missing values of the column are not counted
+def count_by_day(cleaned_data, days, column, split_by):
+    values = cleaned_data[column].dt.floor('min') if column in time_columns else cleaned_data[column]
+    keys = [days] + [cleaned_data[split] for split in split_by] + [values]
+    counts = cleaned_data['Session Duration'].astype('int64').groupby(keys, observed=True, dropna=False, sort=False).agg(['size', 'sum']).reset_index()
+    counts = counts[counts[column].notna()].rename(columns={'size': 'count', 'sum': 'duration'})
+    # Grouped by their categories, then kept as plain values: each chunk has categories of its own
+    categorical = [key for key in split_by + [column] if isinstance(counts[key].dtype, pd.CategoricalDtype)]
+    return counts.astype({key: object for key in categorical}).set_index(['Day'] + split_by + [column])
+
+# Function to turn the sum of count times, in whole seconds, into their mean to the nearest nanosecond. The
+# sum is divided as an integer: DataFrame.describe averages float nanoseconds instead, and its mean can be
+# off the exact one by its rounding, well under a microsecond
+def mean_time(total_seconds, count):
+    return pd.Timestamp((2 * int(total_seconds) * 10 ** 9 + count) // (2 * count))
+
+# Function to add up counts of the same day and values
+def merge_counts(frames):
+    combined = pd.concat(frames)
+    return combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, sort=True).sum()
+
+# Aggregates of the logs of a CSV file, between two dates. Slicing them by time or selecting columns
+# returns other aggregates over the same counts; the query methods answer over the days of the slice,
+# optionally only the logs of a section, as a ('Section', value) condition
+class LogAggregates:
+    def __init__(self, chunk_bytes):
+        self.chunk_bytes = chunk_bytes
+        self.counts = {}  # column: counts by day, split columns and value
+        self.days = pd.DataFrame(columns=list(day_aggregations), index=pd.DatetimeIndex([]), dtype='int64')  # day_aggregations by day
+        self.first_rows = empty_log_frame()
+        self.rollup = build_rollup(empty_log_frame())
+        self.parts = []  # (path, bytes read) of every file aggregated
+        self.malformed_count = 0
+        self.malformed_example = None
+        self.time_quantile_cache = {}
+        self.start_date = None
+        self.end_date = None
+        self.columns = log_columns + derived_columns
+
+    # Function to return aggregates over the same counts with another time range or columns
+    def view(self, start_date, end_date, columns):
+        aggregates = copy.copy(self)
+        aggregates.start_date, aggregates.end_date, aggregates.columns = start_date, end_date, list(columns)
+        return aggregates
+
+    # Function to return unsliced aggregates to fold more logs into, leaving these unchanged. add replaces
+    # the counts of each column in the dict, so the copy needs a dict of its own; the rest is reassigned
+    def copy(self):
+        aggregates = self.view(None, None, log_columns + derived_columns)
+        aggregates.counts = dict(self.counts)
+        aggregates.parts = list(self.parts)
+        aggregates.time_quantile_cache = {}
+        return aggregates
+
+    # Function to fold a chunk of enriched logs and its malformed lines into the aggregates
+    def add(self, cleaned_data, malformed):
+        if len(malformed):
+            self.malformed_example = self.malformed_example if self.malformed_count else malformed.iloc[0]
+            self.malformed_count += len(malformed)
+        if cleaned_data.empty:
+            return
+        with timed('aggregate'):
+            days = cleaned_data['Timestamp Start'].dt.floor('D').rename('Day')
+            for column, split_by in counted_columns.items():
+                chunk_counts = count_by_day(cleaned_data, days, column, split_by)
+                self.counts[column] = merge_counts([self.counts[column], chunk_counts]) if column in self.counts else merge_counts([chunk_counts])
+            self.days = self.merge_days(cleaned_data, days)
+            first_rows = sort_by_time(concat_log_frames([self.first_rows, sort_by_time(cleaned_data)]))
+            self.first_rows = first_rows.groupby(first_rows['Timestamp Start'].dt.floor('D'), sort=False).head(head_rows).reset_index(drop=True)
+        with timed('rollup'):
+            self.rollup = merge_rollups([self.rollup, build_rollup(cleaned_data)])
+
+    # Function to add the number of logs of each day and the sum, minimum and maximum of their times
+    def merge_days(self, cleaned_data, days):
+        seconds = pd.DataFrame({column: cleaned_data[column].to_numpy().astype('int64') // 10 ** 9 for column in time_columns},
+                               index=days.to_numpy())
+        grouped = seconds.groupby(level=0)
+        chunk_days = grouped.agg(['sum', 'min', 'max'])
+        chunk_days.columns = [f'{column} {statistic}' for column, statistic in chunk_days.columns]
+        chunk_days.insert(0, 'count', grouped.size())
+        return pd.concat([self.days, chunk_days]).groupby(level=0).agg(day_aggregations)
+
+    def __getitem__(self, columns):
+        return self.view(self.start_date, self.end_date, columns)
+
+    def __len__(self):
+        return self.row_count()
+
+    # Function to narrow the aggregates down to the days from start_date to end_date
+    def time_slice(self, start_date=None, end_date=None):
+        start_date = start_date if start_date is not None else self.start_date
+        end_date = end_date if end_date is not None else self.end_date
+        return self.view(start_date, end_date, self.columns)
+
+    # Function to tell which of the given days are in the time range
+    def in_range(self, days):
+        selected = np.ones(len(days), dtype=bool)
+        if self.start_date is not None:
+            selected &= days >= pd.Timestamp(self.start_date)
+        if self.end_date is not None:
+            selected &= days < pd.Timestamp(self.end_date) + pd.Timedelta(days=1)
+        return selected
+
+    # Function to add up the counts of a column over the time range, by value in order of the values
+    def column_counts(self, column, condition=None):
+        counts = self.counts.get(column)
+        if counts is None:
+            return pd.DataFrame({'count': pd.Series(dtype='int64'), 'duration': pd.Series(dtype='int64')}, index=pd.Index([], name=column))
+        counts = counts[self.in_range(counts.index.get_level_values('Day'))]
+        if condition is not None:
+            counts = counts[counts.index.get_level_values(condition[0]) == condition[1]]
+        return counts.groupby(level=column, sort=True).sum()
+
+    def row_count(self, condition=None):
+        if condition is not None:
+            return int(self.column_counts(condition[0])['count'].get(condition[1], 0))
+        return int(self.days['count'][self.in_range(self.days.index)].sum())
+
+    def distinct_count(self, column):
+        return int((self.column_counts(column)['count'] > 0).sum())
+
+    # Function to count the rows of each value of a column, most common first like value_counts
+    def value_counts(self, column, condition=None):
+        counts = self.column_counts(column, condition)['count']
+        return counts[counts > 0].sort_values(ascending=False, kind='stable').rename('count')
+
+    # Function to count the rows of each value of a column, in order of the values like groupby().size()
+    def group_sizes(self, column):
+        counts = self.column_counts(column)['count']
+        return counts[counts > 0]
+
+    # Function to average the session durations over the rows of each value of a column, like groupby()[column].mean()
+    def mean_by(self, by, column, condition=None):
+        if column != 'Session Duration':
+            raise ValueError(f"Only session durations are averaged, not {column}")
+        counts = self.column_counts(by, condition)
+        counts = counts[counts['count'] > 0]
+        return (counts['duration'] / counts['count']).rename(column)
+
+    # Function to return each distinct value of a numeric column with its number of rows, sorted by value
+    def distinct_values(self, column):
+        counts = self.column_counts(column)['count']
+        counts = counts[counts > 0]
+        return counts.index.to_numpy(dtype='float64'), counts.to_numpy(dtype='int64')
+
+    # Function to count a numeric column into equal-width bins like histogram_bins, from its distinct values
+    def histogram(self, column, nbins=50):
+        values, counts = self.distinct_values(column)
+        if len(values) == 0:
+            return pd.DataFrame({'center': [], 'left': [], 'right': [], 'count': []})
+        bin_counts, edges = np.histogram(values, bins=nbins, weights=counts)
+        return pd.DataFrame({'center': (edges[:-1] + edges[1:]) / 2, 'left': edges[:-1], 'right': edges[1:], 'count': bin_counts.astype('int64')})
+
+    # Function to summarize the counted numeric and time columns like DataFrame.describe
+    def describe(self, exclude=()):
+        days = self.days[self.in_range(self.days.index)]
+        summaries = {}
+        for column in self.columns:
+            if column in exclude or column not in described_columns:
+                continue
+            if column in time_columns:
+                count = int(days['count'].sum())
+                if not count:
+                    summaries[column] = describe_seconds(0, None, None, [None] * 3, None)
+                    continue
+                summaries[column] = describe_seconds(count, mean_time(days[column + ' sum'].sum(), count), days[column + ' min'].min(),
+                                                     self.time_quantiles(column, (0.25, 0.5, 0.75)), days[column + ' max'].max())
+            else:
+                summaries[column] = describe_counts(*self.distinct_values(column))
+        return describe_frame(summaries)
+
+    # Function to find quantiles of a time column, linearly interpolated, in whole seconds. The counts by the
+    # minute tell which minutes hold the rows around each quantile; a second pass over the files counts
+    # the seconds of those minutes only
+    def time_quantiles(self, column, quantiles):
+        key = (column, self.start_date, self.end_date, tuple(quantiles))
+        if key in self.time_quantile_cache:
+            return self.time_quantile_cache[key]
+        minutes = self.column_counts(column)['count']
+        minutes = minutes[minutes > 0]
+        cumulative = minutes.cumsum().to_numpy()
+        positions = [(cumulative[-1] - 1) * quantile for quantile in quantiles]
+        ranks = sorted({min(int(np.floor(position)) + offset, cumulative[-1] - 1) for position in positions for offset in (0, 1)})
+        wanted = minutes.index[np.searchsorted(cumulative, ranks, side='right')].unique()
+
+        seconds = pd.Series(dtype='int64')
+        for path, end in self.parts:
+            for cleaned_data, _, _ in read_log_chunks(path, self.chunk_bytes, end=end):
+                times = cleaned_data[column][self.in_range(cleaned_data['Timestamp Start'].dt.floor('D').to_numpy())]
+                times = times[times.dt.floor('min').isin(wanted)]
+                seconds = seconds.add(times.value_counts(), fill_value=0)
+        seconds = seconds.sort_index()
+
+        # Rank of the first row of each wanted minute, to place the counted seconds among all the rows
+        before = pd.Series(cumulative - minutes.to_numpy(), index=minutes.index)[wanted]
+        values = {}
+        for rank in ranks:
+            minute = minutes.index[np.searchsorted(cumulative, rank, side='right')]
+            in_minute = seconds[(seconds.index >= minute) & (seconds.index < minute + pd.Timedelta(minutes=1))]
+            position = np.searchsorted(in_minute.cumsum().to_numpy(), rank - before[minute], side='right')
+            values[rank] = in_minute.index[position].value // 10 ** 9
+        results = []
+        for position in positions:
+            lower = values[int(np.floor(position))]
+            upper = values[min(int(np.floor(position)) + 1, cumulative[-1] - 1)]
+            results.append(lower + (upper - lower) * (position - np.floor(position)))
+        self.time_quantile_cache[key] = results
+        return results
+
+    # Function to return the first n rows of the time range, in order of time, at most head_rows
+    def head(self, n=5):
+        return time_slice(self.first_rows, self.start_date, self.end_date).head(min(n, head_rows))[self.columns].reset_index(drop=True)
+
+    # Function to yield the logs of the time range chunk_size rows at a time, reading the files again;
+    # at least one, maybe empty, frame. The logs come in the order of the files, each chunk sorted by time
+    def chunks(self, chunk_size):
+        rows = self.first_rows.iloc[:0][self.columns]
+        yielded = False
+        for path, end in self.parts:
+            for cleaned_data, _, _ in read_log_chunks(path, self.chunk_bytes, end=end):
+                in_range = self.in_range(cleaned_data['Timestamp Start'].dt.floor('D').to_numpy())
+                rows = concat_log_frames([rows, cleaned_data[in_range][self.columns]])
+                while len(rows) >= chunk_size:
+                    yield sort_by_time(rows.iloc[:chunk_size].reset_index(drop=True))
+                    yielded = True
+                    rows = rows.iloc[chunk_size:]
+        if len(rows) or not yielded:
+            yield sort_by_time(rows.reset_index(drop=True))
+
+# Cache of the aggregates of a CSV file and its rotated segments, which only reads what was appended
+# since the last load. A file that shrank, was replaced or removed makes every file be read again
+class AggregateLogCache:
+    def __init__(self, chunk_bytes=64 * 1024 * 1024):
+        self.chunk_bytes = chunk_bytes
+        self.aggregates = LogAggregates(chunk_bytes)
+        self.offsets = {}  # (device, inode): bytes read
+        self.heads = {}  # (device, inode): first bytes, to notice a file rewritten in place
+        self.version = 0  # bumped whenever a load returns different aggregates
+        self.lock = threading.Lock()
+
+    # Function to return the aggregates of the logs of a CSV file and its rotated segments
+    def load(self, csv_file):
+        with self.lock:
+            files, changed = [], False
+            for path in log_segments(csv_file):
+                stat = os.stat(path)
+                identity = (stat.st_dev, stat.st_ino)
+                with open(path, 'rb') as log_file:
+                    head = log_file.read(len(self.heads.get(identity, b'')))
+                changed |= stat.st_size < self.offsets.get(identity, 0) or head != self.heads.get(identity, b'')
+                files.append((path, identity, stat.st_size))
+            # Counts cannot be taken back out: start over when logs already counted may be gone
+            reset = changed or bool(set(self.offsets) - {identity for _, identity, _ in files})
+            if reset:
+                self.aggregates, self.offsets, self.heads = LogAggregates(self.chunk_bytes), {}, {}
+
+            aggregates = None
+            for path, identity, size in files:
+                offset = self.offsets.get(identity, 0)
+                if size == offset:
+                    continue
+                aggregates = aggregates or self.aggregates.copy()
+                for cleaned_data, malformed, offset in read_log_chunks(path, self.chunk_bytes, start=offset, end=size):
+                    aggregates.add(cleaned_data, malformed)
+                self.offsets[identity] = offset
+                with open(path, 'rb') as log_file:
+                    self.heads[identity] = log_file.read(min(64, offset))
+            if aggregates is not None:
+                aggregates.parts = [(path, self.offsets.get(identity, 0)) for path, identity, _ in files]
+                self.aggregates = aggregates
+            # A reset hands out other aggregates even when no file has anything left to read
+            if reset or aggregates is not None:
+                self.version += 1
+            return self.aggregates
+
+    # Function to return the rollup of the logs aggregated by the last load
+    def rollup(self):
+        with self.lock:
+            return self.aggregates.rollup
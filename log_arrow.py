@@ -0,0 +1,15 @@
+import pyarrow as pa
+
+# Arrow types of the parsed log columns, shared by the generator's Arrow endpoint, which sends its record
+# batches in this schema, and by log_parsing, which builds its columns in it before converting them to pandas
+log_arrow_schema = pa.schema([
+    ('IP Address', pa.uint32()),
+    ('Timestamp Start', pa.timestamp('ns')),
+    ('Timestamp End', pa.timestamp('ns')),
+    ('Request', pa.dictionary(pa.int32(), pa.string())),
+    ('Status Code', pa.uint16()),
+    ('Response Size', pa.uint32()),
+    ('User Agent', pa.dictionary(pa.int32(), pa.string())),
+    ('Country Code', pa.dictionary(pa.int32(), pa.string())),
+    ('Traffic Source', pa.dictionary(pa.int32(), pa.string())),
+])
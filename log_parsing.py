@@ -0,0 +1,558 @@
+import calendar
+import io
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from pandas.api.types import union_categoricals
+from instrumentation import timed
+from log_arrow import log_arrow_schema
+from log_store import log_segments
+
+# Columns of a parsed log line, in the order they appear in the line
+log_columns = ['IP Address', 'Timestamp Start', 'Timestamp End', 'Request', 'Status Code', 'Response Size', 'User Agent', 'Country Code', 'Traffic Source']
+
+log_pattern = r'(\d+\.\d+\.\d+\.\d+) - - \[(.*?)\] - \[(.*?)\]\"(.+?)\" (\d+) (\d+) \"(.+?)\" \"(\w+)\" \"(.+?)\"'
+
+timestamp_format = '%d/%b/%Y:%H:%M:%S'
+
+# Compact in-memory types of the parsed columns: the IP address packed into a uint32, numbers as small
+# unsigned ints and the low-cardinality text columns as categoricals
+log_schema = {
+    'IP Address': 'uint32',
+    'Timestamp Start': 'datetime64[ns]',
+    'Timestamp End': 'datetime64[ns]',
+    'Request': 'category',
+    'Status Code': 'uint16',
+    'Response Size': 'uint32',
+    'User Agent': 'category',
+    'Country Code': 'category',
+    'Traffic Source': 'category',
+}
+
+# Function to pack dotted IPv4 addresses into uint32
+def pack_ip_addresses(ip_addresses):
+    octets = pd.Series(ip_addresses, dtype=object).str.split('.', expand=True).astype('uint32').to_numpy()
+    return (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+# Function to turn packed uint32 IP addresses back into dotted text
+def unpack_ip_addresses(packed):
+    packed = np.asarray(packed, dtype='uint32')
+    octets = [pd.Series(packed >> shift & 255).astype(str) for shift in (24, 16, 8, 0)]
+    return octets[0] + '.' + octets[1] + '.' + octets[2] + '.' + octets[3]
+
+# Function to convert a frame of parsed text columns, like the output of parse_raw_logs_regex, to log_schema
+def apply_log_schema(cleaned_data):
+    cleaned_data = cleaned_data.copy()
+    if 'IP Address' in cleaned_data.columns:
+        cleaned_data['IP Address'] = pack_ip_addresses(cleaned_data['IP Address'])
+    return cleaned_data.astype({column: dtype for column, dtype in log_schema.items() if column in cleaned_data.columns and column != 'IP Address'})
+
+# Function to make a frame readable for people: IP addresses shown as dotted text
+def for_display(cleaned_data):
+    if 'IP Address' not in cleaned_data.columns:
+        return cleaned_data
+    return cleaned_data.assign(**{'IP Address': unpack_ip_addresses(cleaned_data['IP Address']).to_numpy()})
+
+# Function to concatenate parsed frames, merging the categories of categorical columns so they stay categorical
+def concat_log_frames(frames):
+    frames = list(frames)
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    columns = frames[0].columns
+    categorical = [column for column in columns if isinstance(frames[0][column].dtype, pd.CategoricalDtype)]
+    combined = pd.concat([frame.drop(columns=categorical) for frame in frames], ignore_index=True)
+    for column in categorical:
+        combined[column] = union_categoricals([frame[column] for frame in frames])
+    return combined[columns]
+
+# Columns derived from the Request column by classify_request
+request_fields = ['page', 'Section', 'Sports Event', 'Interaction', 'Live Stream Sport']
+
+# Columns derived from the parsed ones by enrich_logs
+derived_columns = request_fields + ['Browser', 'Device', 'Session Duration']
+
+# Product tokens naming each browser, in order of priority: browsers name the engines they build on too,
+# e.g. Edge sends 'Chrome/... Edge/... Safari/...' and Chrome on iOS 'CriOS/... Safari/...'
+browser_tokens = [
+    ('Edge', {'Edge', 'Edg', 'EdgA', 'EdgiOS'}),
+    ('Opera', {'OPR', 'Opera'}),
+    ('Firefox', {'Firefox', 'FxiOS'}),
+    ('Chrome', {'Chrome', 'CriOS'}),
+    ('Safari', {'Safari'}),
+]
+
+# Platform words naming each device, in order of priority: Android agents also say Linux
+device_tokens = ['iPad', 'iPhone', 'Android', 'Windows', 'Macintosh', 'Linux']
+
+# Function to find the browser and device of a user agent string. Agents repeat a lot, so the
+# results are kept in a bounded cache shared by every load in the process
+@lru_cache(maxsize=4096)
+def parse_user_agent(user_agent):
+    products = set(re.findall(r'([\w.]+)/', user_agent))
+    words = set(re.findall(r'\w+', user_agent))
+    browser = next((name for name, tokens in browser_tokens if products & tokens), None)
+    device = next((name for name in device_tokens if name in words), None)
+    return browser, device
+
+# Function to classify a request like 'POST /olympic-channel/live-stream/Tennis/chat HTTP/1.1' into the values
+# of request_fields: its page, the section of the site, the sport of an interaction with a live stream,
+# the interaction (chat, poll, share-reaction, end or favorite) and the sport of any live stream request
+def classify_request(request):
+    parts = request.split()
+    page = parts[1] if len(parts) > 1 else None
+    segments = page.strip('/').split('/') if page else []
+    section = segments[0] if segments else None
+    sport = interaction = None
+    if segments[:2] == ['olympic-channel', 'live-stream']:
+        section = 'live-stream'
+        sport = segments[2] if len(segments) > 2 else None
+        interaction = segments[3] if len(segments) > 3 else None
+    elif section == 'sports' and len(segments) > 2:
+        interaction = segments[2]
+    sports_event = sport if interaction else None
+    return page, section, sports_event, interaction, sport
+
+# Function to turn values given per category of a categorical column into a categorical column of their own,
+# by looking up the codes of the column
+def categorical_lookup(column, values):
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), sort=True)
+    # Code -1 (a missing value) picks the -1 appended at the end, so it stays missing
+    return pd.Categorical.from_codes(np.append(codes, -1)[column.cat.codes], categories=pd.Index(uniques, dtype=object))
+
+# Function to derive the request_fields columns from the Request column, classifying each distinct request once
+def classify_requests(request):
+    request = request.astype('category')
+    classes = pd.DataFrame([classify_request(value) for value in request.cat.categories], columns=request_fields, dtype=object)
+    return {field: categorical_lookup(request, classes[field]) for field in request_fields}
+
+# Function to derive the Browser and Device columns from the User Agent column, parsing each distinct agent once
+def resolve_user_agents(user_agent):
+    user_agent = user_agent.astype('category')
+    parsed = pd.DataFrame([parse_user_agent(value) for value in user_agent.cat.categories], columns=['Browser', 'Device'], dtype=object)
+    return {field: categorical_lookup(user_agent, parsed[field]) for field in parsed.columns}
+
+# Function to add the derived columns the dashboard reads: the request_fields of the request, browser
+# and device of the user agent and the session duration in seconds.
+# The text columns are derived once per distinct request or user agent, not once per row
+def enrich_logs(cleaned_data):
+    enriched = {
+        **classify_requests(cleaned_data['Request']),
+        **resolve_user_agents(cleaned_data['User Agent']),
+        'Session Duration': (cleaned_data['Timestamp End'] - cleaned_data['Timestamp Start']).dt.total_seconds().astype('int32'),
+    }
+    # A shallow copy: the parsed columns are shared, not copied, and the caller's frame is left as it was
+    enriched_data = cleaned_data.copy(deep=False)
+    for column, values in enriched.items():
+        enriched_data[column] = values
+    return enriched_data
+
+# Function to return an empty frame of parsed and enriched logs
+def empty_log_frame():
+    return enrich_logs(parse_raw_logs([])[0])
+
+# Function to sort logs by a datetime column. The sort is stable, so merging sorted runs, like a
+# sorted frame and a sorted block appended to it, takes linear time; a sorted frame is returned as is
+def sort_by_time(cleaned_data, column='Timestamp Start'):
+    times = cleaned_data[column].to_numpy()
+    if (times[1:] >= times[:-1]).all():
+        return cleaned_data
+    return cleaned_data.take(np.argsort(times, kind='stable')).reset_index(drop=True)
+
+# Function to cut logs sorted by a datetime column down to the times from the start of start_date
+# to the end of end_date, with two binary searches instead of a scan
+def time_slice(cleaned_data, start_date=None, end_date=None, column='Timestamp Start'):
+    times = cleaned_data[column].to_numpy()
+    start = 0 if start_date is None else times.searchsorted(pd.Timestamp(start_date).to_datetime64())
+    end = len(times) if end_date is None else times.searchsorted((pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_datetime64())
+    return cleaned_data.iloc[start:end]
+
+# Function to read the raw log lines of a CSV file, including segments rotated out by fetch_data
+def read_raw_logs(csv_file):
+    return pd.concat([pd.read_csv(segment, header=None) for segment in log_segments(csv_file)], ignore_index=True)[0]
+
+# Function to parse raw log lines into the cleaned columns with the original regex.
+# Kept as the reference for parse_raw_logs: lines that do not match become rows of NaN
+def parse_raw_logs_regex(raw_logs):
+    # Extract information from raw data
+    cleaned_data = pd.Series(raw_logs, dtype=object).str.extract(log_pattern)
+
+    # Rename the columns
+    cleaned_data.columns = log_columns
+
+    # Convert timestamps to datetime format
+    cleaned_data['Timestamp Start'] = pd.to_datetime(cleaned_data['Timestamp Start'], format=timestamp_format)
+    cleaned_data['Timestamp End'] = pd.to_datetime(cleaned_data['Timestamp End'], format=timestamp_format)
+
+    return cleaned_data
+
+# The part of the first piece after the IP address has a fixed width:
+# ' - - [' + 'dd/Mon/YYYY:HH:MM:SS' + '] - [' + 'dd/Mon/YYYY:HH:MM:SS' + ']'
+timestamp_block_length = 52
+timestamp_block_separators = {0: b' - - [', 26: b'] - [', 51: b']'}
+timestamp_start_position = 6
+timestamp_end_position = 31
+
+# Positions of the digits, separators and month name in a 'dd/Mon/YYYY:HH:MM:SS' timestamp
+timestamp_digits = [0, 1, 7, 8, 9, 10, 12, 13, 15, 16, 18, 19]
+timestamp_separators = {2: b'/', 6: b'/', 11: b':', 14: b':', 17: b':'}
+month_keys = np.array([int.from_bytes(month.encode(), 'big') for month in calendar.month_abbr[1:]])
+month_order = np.argsort(month_keys)
+
+# Function to check that the bytes of each row hold the given text at a position
+def has_text(chars, position, text):
+    return (chars[:, position:position + len(text)] == np.frombuffer(text, dtype='uint8')).all(axis=1)
+
+# Function to parse fixed-width 'dd/Mon/YYYY:HH:MM:SS' timestamps given as an (n, 20) array of bytes.
+# Returns datetime64[ns] values and a mask of the timestamps that are well formed
+def parse_timestamp_chars(chars):
+    digits = chars[:, timestamp_digits].astype('int64') - ord('0')
+    ok = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    for position, separator in timestamp_separators.items():
+        ok &= has_text(chars, position, separator)
+    month_key = (chars[:, 3].astype('int64') << 16) | (chars[:, 4].astype('int64') << 8) | chars[:, 5]
+    month_index = month_order[np.searchsorted(month_keys, month_key, sorter=month_order).clip(0, 11)]
+    ok &= month_keys[month_index] == month_key
+
+    day = digits[:, 0] * 10 + digits[:, 1]
+    year = digits[:, 2] * 1000 + digits[:, 3] * 100 + digits[:, 4] * 10 + digits[:, 5]
+    hour = digits[:, 6] * 10 + digits[:, 7]
+    minute = digits[:, 8] * 10 + digits[:, 9]
+    second = digits[:, 10] * 10 + digits[:, 11]
+    ok &= (day >= 1) & (hour < 24) & (minute < 60) & (second < 60)
+
+    month_start = ((year - 1970) * 12 + month_index).astype('M8[M]')
+    date = month_start.astype('M8[D]') + (day - 1).astype('m8[D]')
+    ok &= date.astype('M8[M]') == month_start  # rejects days past the end of the month, e.g. 31/Jun
+
+    seconds = date.astype('int64') * 86400 + hour * 3600 + minute * 60 + second
+    return (np.where(ok, seconds, 0) * 1_000_000_000).view('M8[ns]'), ok
+
+# Function to read `count` decimal numbers separated by `separator` from an (n, width) array of bytes,
+# looking at the first `lengths` bytes of each row. Returns an (n, count) array and a mask of the well formed rows
+def parse_number_fields(chars, lengths, separator, count):
+    n, width = chars.shape
+    rows = np.arange(n)
+    numbers = np.zeros((n, count), dtype='int64')
+    ok = (lengths > 0) & (lengths <= width)
+    current = np.zeros(n, dtype='int64')
+    digits = np.zeros(n, dtype='int8')
+    field = np.zeros(n, dtype='int8')
+
+    # Scan the windows one column at a time, closing the current number at each separator
+    for position in range(width):
+        column = chars[:, position]
+        inside = position < lengths
+        is_digit = inside & (column >= ord('0')) & (column <= ord('9'))
+        is_separator = inside & (column == ord(separator))
+        ok &= ~inside | is_digit | is_separator
+        current = np.where(is_digit, current * 10 + (column - ord('0')), current)
+        digits += is_digit
+
+        closed = np.flatnonzero(is_separator)
+        if len(closed):
+            ok[closed] &= (digits[closed] > 0) & (field[closed] < count - 1)
+            numbers[closed, np.minimum(field[closed], count - 1)] = current[closed]
+            current[closed] = 0
+            digits[closed] = 0
+            field[closed] += 1
+
+    ok &= (digits > 0) & (digits <= 10) & (field == count - 1)
+    numbers[rows, np.minimum(field, count - 1)] = current
+    return numbers, ok
+
+# Function to gather `width` bytes from each start position
+def byte_windows(data, starts, width):
+    starts = np.maximum(starts, 0)
+    positions = starts[:, None] + np.arange(width)
+    # Only a malformed last line can run past the end of the data
+    if len(starts) and starts.max() + width > len(data):
+        positions = positions.clip(0, len(data) - 1)
+    return data[positions]
+
+# Function to dictionary encode a string column, so it reaches pandas as a categorical without a Python string per row
+def categorical_column(column):
+    return pc.dictionary_encode(column)
+
+# Function to parse raw log lines into the cleaned columns without a regex.
+# A line is split on its double quotes into 9 pieces:
+#   'IP - - [start] - [end]', request, ' status size ', user agent, ' ', country, ' ', source, ''
+# The fixed-width separators and timestamps at the end of the first piece, the IP address, the
+# numbers and the length of every piece are then read with NumPy straight from the bytes of the pieces.
+# The rows come out in log_schema. Returns the parsed rows and a Series of the lines that are not
+# in that format, indexed by line number
+def parse_raw_logs(raw_logs):
+    lines = raw_logs if isinstance(raw_logs, (pa.Array, pa.ChunkedArray)) else pa.array(raw_logs, type=pa.string(), from_pandas=True)
+    if isinstance(lines, pa.ChunkedArray):
+        return parse_raw_log_chunks(lines)
+
+    pieces = pc.split_pattern(lines, '"')
+    nine_pieces = pc.fill_null(pc.equal(pc.list_value_length(pieces), 9), False)
+    positions = pc.indices_nonzero(nine_pieces).to_numpy()
+    # From here on only lines with the right number of pieces are looked at
+    if len(positions) < len(lines):
+        pieces = pc.filter(pieces, nine_pieces)
+
+    # Start and end of every piece in the bytes of the flattened pieces, one row of 9 per line
+    flat = pieces.flatten()
+    offsets = np.frombuffer(flat.buffers()[1], dtype='int32')[flat.offset:flat.offset + len(flat) + 1]
+    data = np.frombuffer(flat.buffers()[2], dtype='uint8') if len(flat) else np.zeros(1, dtype='uint8')
+    starts = offsets[:-1].reshape(-1, 9).astype('int64')
+    lengths = (offsets[1:] - offsets[:-1]).reshape(-1, 9).astype('int64')
+
+    # The last 52 bytes of the first piece hold the separators and both timestamps
+    ip_length = lengths[:, 0] - timestamp_block_length
+    well_formed = ip_length >= 7
+    block = byte_windows(data, starts[:, 0] + ip_length, timestamp_block_length)
+    for position, separator in timestamp_block_separators.items():
+        well_formed &= has_text(block, position, separator)
+    timestamp_start, start_ok = parse_timestamp_chars(block[:, timestamp_start_position:timestamp_start_position + 20])
+    timestamp_end, end_ok = parse_timestamp_chars(block[:, timestamp_end_position:timestamp_end_position + 20])
+    well_formed &= start_ok & end_ok
+
+    # The IP address before them is packed into a uint32
+    octets, ip_ok = parse_number_fields(byte_windows(data, starts[:, 0], 15), ip_length, '.', 4)
+    well_formed &= ip_ok & (octets <= 255).all(axis=1)
+    ip_address = (octets[:, 0] << 24 | octets[:, 1] << 16 | octets[:, 2] << 8 | octets[:, 3]).astype('uint32')
+
+    # ' status size ': single spaces around and between the two numbers
+    numbers_start, numbers_length = starts[:, 2], lengths[:, 2]
+    well_formed &= (data[numbers_start.clip(0, len(data) - 1)] == ord(' ')) & (data[(numbers_start + numbers_length - 1).clip(0, len(data) - 1)] == ord(' '))
+    numbers, numbers_ok = parse_number_fields(byte_windows(data, numbers_start + 1, 16), numbers_length - 2, ' ', 2)
+    well_formed &= numbers_ok & (numbers[:, 0] <= np.iinfo('uint16').max) & (numbers[:, 1] <= np.iinfo('uint32').max)
+
+    # Request, user agent and source are not empty, the pieces between the quoted fields are single spaces
+    well_formed &= (lengths[:, 1] > 0) & (lengths[:, 3] > 0) & (lengths[:, 7] > 0) & (lengths[:, 8] == 0)
+    for gap in (4, 6):
+        well_formed &= (lengths[:, gap] == 1) & (data[starts[:, gap].clip(0, len(data) - 1)] == ord(' '))
+
+    # The country code is a word, checked once per distinct value
+    country_code = categorical_column(pc.list_element(pieces, 5))
+    country_ok = pc.utf8_is_alnum(country_code.dictionary).to_numpy(zero_copy_only=False)
+    well_formed &= country_ok[country_code.indices.to_numpy(zero_copy_only=False)]
+
+    columns = [ip_address, timestamp_start, timestamp_end, categorical_column(pc.list_element(pieces, 1)),
+               numbers[:, 0].astype('uint16'), numbers[:, 1].astype('uint32'),
+               categorical_column(pc.list_element(pieces, 3)), country_code, categorical_column(pc.list_element(pieces, 7))]
+    table = pa.table([pa.array(column) if isinstance(column, np.ndarray) else column for column in columns], names=log_columns)
+    if not well_formed.all():
+        table = table.filter(pa.array(well_formed))
+    cleaned_data = table.to_pandas()
+
+    # Everything that was dropped along the way is reported, with its line number
+    malformed_mask = np.ones(len(lines), dtype=bool)
+    malformed_mask[positions[well_formed]] = False
+    malformed_positions = np.flatnonzero(malformed_mask)
+    malformed = pd.Series(pc.take(lines, pa.array(malformed_positions, type=pa.int64())).to_numpy(zero_copy_only=False), index=malformed_positions, dtype=object)
+
+    return cleaned_data, malformed
+
+# Function to turn a table of typed log columns, like the record batches of the generator's Arrow
+# endpoint, into parsed logs in log_schema. Nothing is parsed. In a table of a single batch the numeric
+# and time columns are handed to pandas without a copy, as arrays over the table's buffers.
+# What copies: the codes of the categorical columns, their categories (once per distinct value, not
+# per row), every column of a table of several batches, to join them, and a table in another schema, cast first
+def logs_from_arrow(table):
+    if not table.schema.equals(log_arrow_schema):
+        table = table.select(log_columns).cast(log_arrow_schema)
+    return table.to_pandas(split_blocks=True)  # one array per column, not consolidated into copied 2D blocks
+
+# Function to parse the chunks of a chunked array one by one, numbering malformed lines across chunks
+def parse_raw_log_chunks(lines):
+    frames, malformed, start = [], [], 0
+    for chunk in lines.chunks or [pa.array([], pa.string())]:
+        cleaned_data, chunk_malformed = parse_raw_logs(chunk)
+        frames.append(cleaned_data)
+        chunk_malformed.index += start
+        malformed.append(chunk_malformed)
+        start += len(chunk)
+    return concat_log_frames(frames), pd.concat(malformed)
+
+# Function to parse the raw log lines held in a block of bytes from the CSV file
+def parse_csv_bytes(data):
+    skipped = []
+    # Rows that are not a single quoted field are skipped by the CSV reader and reported with the malformed lines
+    def skip_invalid_row(row):
+        skipped.append(row.text)
+        return 'skip'
+    table = pacsv.read_csv(io.BytesIO(data),
+                           read_options=pacsv.ReadOptions(column_names=['log']),
+                           parse_options=pacsv.ParseOptions(invalid_row_handler=skip_invalid_row),
+                           convert_options=pacsv.ConvertOptions(column_types={'log': pa.string()}))
+    cleaned_data, malformed = parse_raw_logs(table.column('log'))
+    if skipped:
+        malformed = pd.concat([malformed, pd.Series(skipped, dtype=object)], ignore_index=True)
+    return cleaned_data, malformed
+
+# Smallest range of a file worth parsing in a process of its own: files with fewer bytes than two of
+# them are parsed serially, where starting a pool would cost more than it saves
+parallel_range_bytes = 16 * 1024 * 1024
+
+# Function to find where the last complete line in bytes [start, end) of an open file ends, start if none
+# does, reading back from the end a block at a time
+def complete_lines_end(log_file, start, end, block_size=65536):
+    position = end
+    while position > start:
+        block_start = max(start, position - block_size)
+        log_file.seek(block_start)
+        newline = log_file.read(position - block_start).rfind(b'\n')
+        if newline != -1:
+            return block_start + newline + 1
+        position = block_start
+    return start
+
+# Function to split bytes [start, end) of a file, which end at a line end, into up to `parts` ranges
+# of about the same size, each ending at a line end
+def newline_ranges(path, start, end, parts):
+    bounds = [start]
+    with open(path, 'rb') as log_file:
+        for part in range(1, parts):
+            position = max(start + (end - start) * part // parts, bounds[-1])
+            if position >= end:
+                break
+            # Move on to the start of the next line, unless the position is one already
+            log_file.seek(position - 1)
+            log_file.readline()
+            bounds.append(min(log_file.tell(), end))
+    bounds.append(end)
+    return [(range_start, range_end) for range_start, range_end in zip(bounds[:-1], bounds[1:]) if range_end > range_start]
+
+# Function to parse and enrich the lines in bytes [start, end) of a file, run in the worker processes
+def parse_file_range(path, start, end):
+    with open(path, 'rb') as log_file:
+        log_file.seek(start)
+        data = log_file.read(end - start)
+    cleaned_data, malformed = parse_csv_bytes(data)
+    return enrich_logs(cleaned_data), malformed
+
+# Function to parse and enrich the lines in bytes [start, end) of a file, which end at a line end. Large
+# ranges are split into newline-aligned ranges parsed over a pool of `workers` processes, all the CPUs
+# when None; with one worker, or too few bytes to split, they are parsed in this process
+def parse_file(path, start, end, workers=None):
+    parts = min(workers or os.cpu_count() or 1, (end - start) // parallel_range_bytes)
+    if parts <= 1:
+        with timed('read'):
+            with open(path, 'rb') as log_file:
+                log_file.seek(start)
+                data = log_file.read(end - start)
+        with timed('parse'):
+            cleaned_data, malformed = parse_csv_bytes(data)
+        with timed('enrich'):
+            cleaned_data = enrich_logs(cleaned_data)
+        return cleaned_data, malformed
+
+    ranges = newline_ranges(path, start, end, parts)
+    with timed('parse'):
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            results = list(executor.map(parse_file_range, repeat(path), *zip(*ranges)))
+    with timed('merge'):
+        cleaned_data = concat_log_frames(frame for frame, _ in results)
+        malformed = pd.concat([malformed for _, malformed in results], ignore_index=True)
+    return cleaned_data, malformed
+
+# Parsed logs of a file and how far into the file they go
+class ParsedSegment:
+    def __init__(self, device, inode):
+        self.device = device
+        self.inode = inode
+        self.reset()
+
+    def reset(self):
+        self.head = b''  # first bytes of the file, to notice when it is replaced by a different one
+        self.offset = 0
+        self.frame = empty_log_frame()
+        self.malformed = pd.Series(dtype=object)
+
+# Cache of parsed and enriched logs which only parses what was appended to a file since the last load.
+# The logs are kept sorted by Timestamp Start, so date ranges can be cut out with time_slice.
+# A file that shrank or was replaced is parsed again from the start; a segment rotated out
+# by fetch_data keeps its parsed logs, since it is recognised by its inode. Large appends are parsed
+# over a pool of parse_workers processes, see parse_file
+class IncrementalLogCache:
+    head_size = 64
+
+    def __init__(self, parse_workers=None):
+        self.parse_workers = parse_workers
+        self.segments = {}
+        self.frame = None
+        self.version = 0  # bumped whenever a load returns different logs
+        self.lock = threading.Lock()
+
+    # Function to return the parsed logs of a CSV file and its rotated segments
+    def load(self, csv_file):
+        with self.lock:
+            paths = log_segments(csv_file)
+            previous = self.segments
+            changed = set(paths) != set(previous)
+            self.segments = {}
+            for path in paths:
+                segment = self.find_segment(path, previous)
+                changed |= self.update_segment(path, segment)
+                self.segments[path] = segment
+            if changed or self.frame is None:
+                self.version += 1
+                with timed('merge'):
+                    self.frame = sort_by_time(concat_log_frames(segment.frame for segment in self.segments.values())) if self.segments else empty_log_frame()
+            # A shallow copy, so columns added by the caller do not end up in the cache
+            return self.frame.copy(deep=False)
+
+    # Function to return the lines skipped as malformed by the last load
+    def malformed_lines(self):
+        with self.lock:
+            return pd.concat([segment.malformed for segment in self.segments.values()] or [pd.Series(dtype=object)], ignore_index=True)
+
+    # Function to find the cached segment of a path, following it across a rename
+    def find_segment(self, path, previous):
+        stat = os.stat(path)
+        segment = previous.get(path)
+        if segment is not None and (segment.device, segment.inode) == (stat.st_dev, stat.st_ino):
+            return segment
+        for candidate in previous.values():
+            if (candidate.device, candidate.inode) == (stat.st_dev, stat.st_ino):
+                return candidate
+        return ParsedSegment(stat.st_dev, stat.st_ino)
+
+    # Function to add newly parsed logs to a segment. Subclasses can extend it to keep more per segment;
+    # a segment at offset 0 has just been reset
+    def add_block(self, segment, cleaned_data, malformed):
+        segment.frame = sort_by_time(concat_log_frames([segment.frame, sort_by_time(cleaned_data)]))
+        segment.malformed = pd.concat([segment.malformed, malformed], ignore_index=True)
+
+    # Function to parse whatever was appended to the segment's file, returns whether anything changed
+    def update_segment(self, path, segment):
+        with open(path, 'rb') as log_file:
+            size = os.fstat(log_file.fileno()).st_size
+            head = log_file.read(len(segment.head))
+            # Truncated or rewritten in place: start over. The logs parsed so far are gone, which is a change
+            # even when nothing new is parsed below
+            reset = size < segment.offset or head != segment.head
+            if reset:
+                segment.reset()
+            if size == segment.offset:
+                return reset
+
+            # Only complete lines; a line still being written is picked up on the next load
+            end = complete_lines_end(log_file, segment.offset, size)
+            if end == segment.offset:
+                return reset
+            cleaned_data, malformed = parse_file(path, segment.offset, end, self.parse_workers)
+            # The workers open the file by its path: if it was rotated meanwhile, they may have read
+            # another file, and the segment is parsed under its new name on the next load
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return reset
+            if (stat.st_dev, stat.st_ino) != (segment.device, segment.inode):
+                return reset
+            self.add_block(segment, cleaned_data, malformed)
+            segment.offset = end
+            log_file.seek(0)
+            segment.head = log_file.read(min(self.head_size, segment.offset))
+            return True
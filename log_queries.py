@@ -0,0 +1,69 @@
+import pandas as pd
+from chart_data import histogram_bins
+from log_parsing import time_slice
+
+# Aggregations the dashboard asks of the logs. Logs held in a DataFrame are answered by pandas; a
+# SqliteLogView pushes them down to SQLite, which returns only the aggregated result, and LogAggregates
+# answer them from the running counts of a CSV file read in chunks.
+# `condition`, where given, keeps the rows where a column equals a value, as a (column, value) pair
+
+# Function to keep the logs from the start of start_date to the end of end_date
+def slice_logs(data, start_date=None, end_date=None):
+    if not isinstance(data, pd.DataFrame):
+        return data.time_slice(start_date, end_date)
+    return time_slice(data, start_date, end_date)
+
+# Function to select the rows matching a condition of a DataFrame
+def matching_rows(data, condition):
+    return data if condition is None else data[data[condition[0]] == condition[1]]
+
+# Function to count the rows matching a condition
+def row_count(data, condition=None):
+    if not isinstance(data, pd.DataFrame):
+        return data.row_count(condition)
+    return len(matching_rows(data, condition))
+
+# Function to count the distinct values of a column
+def distinct_count(data, column):
+    if not isinstance(data, pd.DataFrame):
+        return data.distinct_count(column)
+    return data[column].nunique()
+
+# Function to count the values of a column, most common first, leaving out categories no row uses
+def value_counts(data, column, condition=None):
+    if not isinstance(data, pd.DataFrame):
+        return data.value_counts(column, condition)
+    counts = matching_rows(data, condition)[column].value_counts()
+    return counts[counts > 0]
+
+# Function to count the rows of each value of a column, in order of the values
+def group_sizes(data, column):
+    if not isinstance(data, pd.DataFrame):
+        return data.group_sizes(column)
+    return data.groupby(column, observed=True).size()
+
+# Function to average a column over the rows of each value of another
+def mean_by(data, by, column, condition=None):
+    if not isinstance(data, pd.DataFrame):
+        return data.mean_by(by, column, condition)
+    return matching_rows(data, condition).groupby(by, observed=True)[column].mean()
+
+# Function to count a numeric column into nbins equal-width bins
+def histogram(data, column, nbins=50):
+    if not isinstance(data, pd.DataFrame):
+        return data.histogram(column, nbins)
+    return histogram_bins(data[column], nbins)
+
+# Function to summarize the numeric and time columns, leaving out the excluded ones
+def describe(data, exclude=()):
+    if not isinstance(data, pd.DataFrame):
+        return data.describe(exclude)
+    return data.drop(columns=list(exclude)).describe()
+
+# Function to yield the logs chunk_size rows at a time, at least one, maybe empty, chunk
+def log_chunks(data, chunk_size):
+    if not isinstance(data, pd.DataFrame):
+        yield from data.chunks(chunk_size)
+        return
+    for start in range(0, max(len(data), 1), chunk_size):
+        yield data.iloc[start:start + chunk_size]
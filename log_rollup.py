@@ -0,0 +1,141 @@
+import os
+import pandas as pd
+from instrumentation import timed
+from log_parsing import IncrementalLogCache, concat_log_frames, empty_log_frame, sort_by_time, time_slice
+from log_sqlite import SqliteLogView
+from log_store import compact_parquet_store, read_parquet_store, write_parquet_store
+
+# Pre-aggregated counts of the logs, in two frames. `hours` has one row per hour x country x traffic
+# source x status code. `pages` has one row per day x page: the dashboard only asks for page counts over
+# whole days, and a page key on the hourly rows made them about as many as the logs.
+# Each row holds the number of logs and the sum of their session durations, so totals and averages
+# over any range of hours can be answered from the rollup instead of the raw rows. Rows are sorted by time
+rollup_dimensions = ['Hour', 'Country Code', 'Traffic Source', 'Status Code']
+page_rollup_dimensions = ['Day', 'page']
+rollup_measures = ['count', 'Session Duration']
+
+class Rollup:
+    def __init__(self, hours, pages):
+        self.hours = hours
+        self.pages = pages
+
+# Function to count enriched logs by the given keys, sorted by the time key first
+def count_rows(cleaned_data, keys):
+    grouped = cleaned_data.groupby(keys, observed=True, sort=False)['Session Duration']
+    counts = pd.DataFrame({'count': grouped.size(), 'Session Duration': grouped.sum().astype('int64')})
+    return sort_by_time(counts.reset_index(), keys[0].name)
+
+# Function to aggregate enriched logs into a rollup
+def build_rollup(cleaned_data):
+    times = cleaned_data['Timestamp Start']
+    hours = count_rows(cleaned_data, [times.dt.floor('h').rename('Hour')] + [cleaned_data[column] for column in rollup_dimensions[1:]])
+    pages = count_rows(cleaned_data, [times.dt.floor('D').rename('Day'), cleaned_data['page']])
+    return Rollup(hours, pages)
+
+# Function to add up the measures of the rows of frames with the same dimensions, sorted by the first
+def merge_counts(frames, dimensions):
+    combined = concat_log_frames(frames)
+    return sort_by_time(combined.groupby(dimensions, observed=True, sort=False)[rollup_measures].sum().reset_index(), dimensions[0])
+
+# Function to merge rollups, adding up the measures of rows with the same dimensions
+def merge_rollups(rollups):
+    rollups = [rollup for rollup in rollups if not rollup.hours.empty]
+    if not rollups:
+        return build_rollup(empty_log_frame())
+    if len(rollups) == 1:
+        return rollups[0]
+    return Rollup(merge_counts([rollup.hours for rollup in rollups], rollup_dimensions),
+                  merge_counts([rollup.pages for rollup in rollups], page_rollup_dimensions))
+
+# The functions answering from a rollup also take a SqliteLogView in its place, which answers the
+# same questions with a GROUP BY over its logs
+
+# Function to keep the rollup rows of the hours from the start of start_date to the end of end_date
+def filter_rollup(rollup, start_date=None, end_date=None):
+    if isinstance(rollup, SqliteLogView):
+        return rollup.time_slice(start_date, end_date)
+    return Rollup(time_slice(rollup.hours, start_date, end_date, 'Hour'), time_slice(rollup.pages, start_date, end_date, 'Day'))
+
+# Function to count logs by a dimension of the rollup or by a key computed from it, most common first like value_counts
+def rollup_counts(rollup, by):
+    if isinstance(rollup, SqliteLogView):
+        return rollup.value_counts(by)
+    counts = (rollup.pages if by == 'page' else rollup.hours).groupby(by, observed=True)['count'].sum()
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+# Function to return the number of logs and the sum of their session durations
+def rollup_totals(rollup):
+    if isinstance(rollup, SqliteLogView):
+        return rollup.totals()
+    return rollup.hours['count'].sum(), rollup.hours['Session Duration'].sum()
+
+# Keys grouping the hours of a rollup by period
+time_periods = {
+    'hour': lambda hours: hours.dt.hour.rename('hour'),
+    'day': lambda hours: hours.dt.date.rename('day'),
+    'week': lambda hours: hours.dt.isocalendar().week,
+    'month': lambda hours: hours.dt.month.rename('month'),
+}
+
+# Function to count logs by a period of time_periods, and by a dimension of the rollup first when given
+def rollup_time_counts(rollup, period, by=None):
+    rollup = rollup.hourly_counts(by) if isinstance(rollup, SqliteLogView) else rollup.hours
+    keys = ([rollup[by]] if by else []) + [time_periods[period](rollup['Hour'])]
+    return rollup.groupby(keys, observed=True)['count'].sum()
+
+# Function to return where the rollup store at root keeps its page counts, a store next to it
+def page_rollup_store(root):
+    return root.rstrip(os.sep) + '_pages'
+
+# Function to add a batch of enriched logs to the rollup store, as a new file in each day it touches.
+# The page counts go first, so they are in place once the hourly rows that mark a new version are
+def write_rollup(cleaned_data, root):
+    rollup = build_rollup(cleaned_data)
+    write_parquet_store(rollup.pages, page_rollup_store(root), time_column='Day')
+    write_parquet_store(rollup.hours, root, time_column='Hour')
+
+# Function to read the rollup store, only opening the days in [start_date, end_date]
+def read_rollup(root, start_date=None, end_date=None):
+    hours = read_parquet_store(root, start_date, end_date)
+    pages = [read_parquet_store(page_rollup_store(root), start_date, end_date)] if os.path.isdir(page_rollup_store(root)) else []
+    # Hourly rows written before pages had their own store still hold a page, counted by day here
+    if 'page' in hours.columns:
+        pages.append(count_pages(hours))
+    empty = build_rollup(empty_log_frame())
+    return Rollup(merge_counts([empty.hours, hours], rollup_dimensions), merge_counts([empty.pages] + pages, page_rollup_dimensions))
+
+# Function to count the logs of hourly rows that still hold a page by day and page
+def count_pages(hours):
+    hours = hours[hours['page'].notna()]
+    grouped = hours.groupby([hours['Hour'].dt.floor('D').rename('Day'), hours['page']], observed=True, sort=False)[rollup_measures].sum()
+    return sort_by_time(grouped.reset_index(), 'Day')
+
+# Function to merge the per-batch rollup files of each day into a single file of summed rows
+def compact_rollup(root):
+    compact_parquet_store(root, combine=lambda hours: merge_counts([hours], rollup_dimensions + (['page'] if 'page' in hours.columns else [])))
+    if os.path.isdir(page_rollup_store(root)):
+        compact_parquet_store(page_rollup_store(root), combine=lambda pages: merge_counts([pages], page_rollup_dimensions))
+
+# Incremental log cache which also keeps the rollup of each segment, updated with every newly parsed block
+class RollupLogCache(IncrementalLogCache):
+    def __init__(self, parse_workers=None):
+        super().__init__(parse_workers)
+        self.merged = None
+        self.merged_frame = None
+
+    def add_block(self, segment, cleaned_data, malformed):
+        super().add_block(segment, cleaned_data, malformed)
+        previous = [segment.rollup] if segment.offset else []
+        with timed('rollup'):
+            segment.rollup = merge_rollups(previous + [build_rollup(cleaned_data)])
+
+    # Function to return the rollup of the logs returned by the last load
+    def rollup(self):
+        with self.lock:
+            # Segments only change on a load that also replaces self.frame
+            if self.merged is None or self.merged_frame is not self.frame:
+                with timed('rollup'):
+                    # A segment at offset 0 has been reset, or never parsed: it has no logs to count
+                    self.merged = merge_rollups(segment.rollup for segment in self.segments.values() if segment.offset)
+                self.merged_frame = self.frame
+            return self.merged
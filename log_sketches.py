@@ -0,0 +1,245 @@
+import itertools
+import json
+import numpy as np
+import pandas as pd
+from log_store import compact_parquet_store, read_parquet_store, write_parquet_store
+
+# Mergeable sketches of the logs, kept for each day by fetch_data next to the rollup. Each sketch is a
+# few KB whatever the number of logs, and the sketches of any range of days merge into the sketch of
+# the whole range, so the dashboard's approximate mode answers distinct counts, top values and
+# quantiles without scanning or hashing the logs of the range
+
+# Function to hash values to 64 bits, the same for a value whichever batch or process it comes from
+def hash_values(values):
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+# HyperLogLog sketch of the distinct values of a column: 2 ** 12 one-byte registers, each keeping the
+# longest run of leading zeros seen among the hashes landing in it
+class HyperLogLog:
+    precision = 12  # the other 52 bits of the hash are exact as a float64, which ranks them below
+
+    def __init__(self, registers=None):
+        self.registers = np.zeros(2 ** self.precision, dtype='uint8') if registers is None else registers
+
+    # Function to build the sketch of the values of each key, as a dict by key
+    @classmethod
+    def grouped(cls, keys, values):
+        present = values.notna().to_numpy()
+        hashes = hash_values(values[present])
+        codes, uniques = pd.factorize(keys[present])
+        buckets = (hashes >> np.uint64(64 - cls.precision)).astype('intp')
+        rest = (hashes & np.uint64(2 ** (64 - cls.precision) - 1)).astype('float64')
+        # 1 + leading zeros of the 52 remaining bits, 53 when they are all zero
+        ranks = (64 - cls.precision + 1 - np.frexp(rest)[1]).astype('uint8')
+        registers = np.zeros((len(uniques), 2 ** cls.precision), dtype='uint8')
+        np.maximum.at(registers, (codes, buckets), ranks)
+        return {key: cls(registers[code]) for code, key in enumerate(uniques)}
+
+    def merge(self, other):
+        return HyperLogLog(np.maximum(self.registers, other.registers))
+
+    # Function to estimate the number of distinct values, counting empty registers while many are left
+    def estimate(self):
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.ldexp(1.0, -self.registers.astype('int64')).sum()
+        empty = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and empty:
+            return m * np.log(m / empty)
+        return raw
+
+    # Function to return the error bound of the estimate: two standard errors, 1.04 / sqrt(m) each,
+    # which the estimate is within about 95% of the time
+    def error_bound(self):
+        return 2 * 1.04 / np.sqrt(len(self.registers)) * self.estimate()
+
+    def to_bytes(self):
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(np.frombuffer(data, dtype='uint8').copy())
+
+# Space-Saving summary of the most common values of a column, at most `capacity` counters, as a dict of
+# value: (count, error), most common first. A value's count is never below its true count, and at most
+# its error above it
+class SpaceSaving:
+    capacity = 64
+
+    def __init__(self, counters=None, total=0):
+        self.counters = {} if counters is None else counters
+        self.total = total
+
+    # Function to build the summary of the values of each key from their exact counts, keeping the most common ones
+    @classmethod
+    def grouped(cls, keys, values):
+        counts = pd.DataFrame({'key': keys, 'value': values}).groupby(['key', 'value'], observed=True).size().reset_index(name='count')
+        counts = counts.sort_values(['key', 'count', 'value'], ascending=[True, False, True])
+        summaries = {}
+        for key, group in itertools.groupby(zip(counts['key'], counts['value'], counts['count']), key=lambda row: row[0]):
+            group = [(value, int(count)) for _, value, count in group]
+            summaries[key] = cls({value: (count, 0) for value, count in group[:cls.capacity]}, sum(count for _, count in group))
+        return summaries
+
+    # Function to return the most a value left out of the summary can have been counted: the smallest
+    # count once the summary is full, nothing before
+    def floor(self):
+        return min(count for count, _ in self.counters.values()) if len(self.counters) >= self.capacity else 0
+
+    # Function to merge two summaries. A value missing from one of them may have been counted up to
+    # its floor there, which is added to both its count and its error
+    def merge(self, other):
+        first, second = self.floor(), other.floor()
+        merged = []
+        for value in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(value, (first, first))
+            other_count, other_error = other.counters.get(value, (second, second))
+            merged.append((value, (count + other_count, error + other_error)))
+        merged.sort(key=lambda item: (-item[1][0], item[0]))
+        return SpaceSaving(dict(merged[:self.capacity]), self.total + other.total)
+
+    # Function to return the n most common values with their counts and errors
+    def top(self, n):
+        top = list(self.counters.items())[:n]
+        return pd.DataFrame([counter for _, counter in top], index=pd.Index([value for value, _ in top], dtype=object),
+                            columns=['count', 'error'], dtype='int64')
+
+    def to_bytes(self):
+        return json.dumps({'total': self.total, 'counters': list(self.counters.items())}).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data):
+        state = json.loads(data)
+        return cls({value: tuple(counter) for value, counter in state['counters']}, state['total'])
+
+# t-digest of the distribution of a numeric column: centroids (mean, weight), small near both ends of
+# the distribution and larger in the middle, with the smallest and largest values kept exactly
+class TDigest:
+    compression = 200  # about compression / 2 centroids
+
+    def __init__(self, means=None, weights=None, minimum=np.nan, maximum=np.nan):
+        self.means = np.zeros(0) if means is None else means
+        self.weights = np.zeros(0) if weights is None else weights
+        self.minimum, self.maximum = minimum, maximum
+
+    # Function to build the digest of the values of each key
+    @classmethod
+    def grouped(cls, keys, values):
+        present = values.notna().to_numpy()
+        codes, uniques = pd.factorize(keys[present])
+        numbers = values[present].to_numpy(dtype='float64')
+        order = np.lexsort((numbers, codes))
+        codes, numbers = codes[order], numbers[order]
+        bounds = np.searchsorted(codes, np.arange(len(uniques) + 1))
+        return {key: cls.compress(numbers[start:end], np.ones(end - start), numbers[start], numbers[end - 1])
+                for key, start, end in zip(uniques, bounds[:-1], bounds[1:])}
+
+    # Function to build a digest from sorted points, merging the neighbouring points that fall in the same
+    # unit of the k1 scale, k(q) = compression / (2 pi) * asin(2q - 1)
+    @classmethod
+    def compress(cls, means, weights, minimum, maximum):
+        if len(means) == 0:
+            return cls()
+        cumulative = np.cumsum(weights)
+        quantiles = (cumulative - weights / 2) / cumulative[-1]
+        scale = np.floor(cls.compression / (2 * np.pi) * np.arcsin(2 * quantiles - 1))
+        starts = np.flatnonzero(np.r_[True, scale[1:] != scale[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        return cls(np.add.reduceat(means * weights, starts) / merged_weights, merged_weights, minimum, maximum)
+
+    def merge(self, other):
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind='stable')
+        return TDigest.compress(means[order], weights[order], np.fmin(self.minimum, other.minimum), np.fmax(self.maximum, other.maximum))
+
+    def count(self):
+        return self.weights.sum()
+
+    # Function to return the fraction of the values below each centroid's middle, with the exact ends
+    def positions(self):
+        cumulative = np.cumsum(self.weights)
+        return np.concatenate([[0.0], (cumulative - self.weights / 2) / cumulative[-1], [1.0]])
+
+    # Function to estimate the values at quantiles q, interpolating between centroids
+    def quantile(self, q):
+        if len(self.means) == 0:
+            return np.full(np.shape(q), np.nan)
+        return np.interp(q, self.positions(), np.concatenate([[self.minimum], self.means, [self.maximum]]))
+
+    # Function to estimate the fraction of values at or below x
+    def cdf(self, x):
+        if len(self.means) == 0:
+            return np.zeros(np.shape(x))
+        return np.interp(x, np.concatenate([[self.minimum], self.means, [self.maximum]]), self.positions())
+
+    # Function to return the error bound of quantile q, as a fraction of the values: the weight of the
+    # centroid holding that rank, which the estimate is interpolated within
+    def rank_error(self, q):
+        if len(self.means) == 0:
+            return np.nan
+        cumulative = np.cumsum(self.weights)
+        return self.weights[min(np.searchsorted(cumulative, q * cumulative[-1]), len(cumulative) - 1)] / cumulative[-1]
+
+    # Function to estimate the counts of nbins equal-width bins, like histogram_bins does with every value
+    def histogram(self, nbins=50):
+        if len(self.means) == 0:
+            return pd.DataFrame({'center': [], 'left': [], 'right': [], 'count': []})
+        edges = np.linspace(self.minimum, self.maximum, nbins + 1)
+        fractions = self.cdf(edges)
+        fractions[0], fractions[-1] = 0.0, 1.0  # the ends are exact, however many values sit on them
+        counts = np.diff(fractions) * self.count()
+        return pd.DataFrame({'center': (edges[:-1] + edges[1:]) / 2, 'left': edges[:-1], 'right': edges[1:], 'count': counts})
+
+    def to_bytes(self):
+        return np.concatenate([[self.minimum, self.maximum], self.means, self.weights]).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        state = np.frombuffer(data, dtype='float64')
+        centroids = (len(state) - 2) // 2
+        return cls(state[2:2 + centroids].copy(), state[2 + centroids:].copy(), state[0], state[1])
+
+# Sketches kept for each day, by name: the sketch type and the column it summarizes
+sketch_columns = {
+    'unique visitors': (HyperLogLog, 'IP Address'),
+    'unique requests': (HyperLogLog, 'Request'),
+    'top pages': (SpaceSaving, 'page'),
+    'top sports': (SpaceSaving, 'Sports Event'),
+    'top countries': (SpaceSaving, 'Country Code'),
+    'response size': (TDigest, 'Response Size'),
+    'session duration': (TDigest, 'Session Duration'),
+}
+
+# Function to sketch enriched logs, one row per day and sketch holding the serialized sketch
+def build_sketches(cleaned_data):
+    days = cleaned_data['Timestamp Start'].dt.floor('D')
+    rows = []
+    for name, (kind, column) in sketch_columns.items():
+        for day, sketch in kind.grouped(days, cleaned_data[column]).items():
+            rows.append((day, name, sketch.to_bytes()))
+    return pd.DataFrame(rows, columns=['Day', 'sketch', 'state']).astype({'Day': 'datetime64[ns]'})
+
+# Function to merge the serialized sketches of the rows into one sketch by name, an empty one for names without rows
+def merge_sketches(rows):
+    sketches = {}
+    for name, (kind, _) in sketch_columns.items():
+        merged = kind()
+        for state in rows['state'][rows['sketch'] == name]:
+            merged = merged.merge(kind.from_bytes(state))
+        sketches[name] = merged
+    return sketches
+
+# Function to add a batch of enriched logs to the sketch store, as a new file in each day it touches
+def write_sketches(cleaned_data, root):
+    write_parquet_store(build_sketches(cleaned_data), root, time_column='Day')
+
+# Function to read and merge the sketches of the days in [start_date, end_date]
+def read_sketches(root, start_date=None, end_date=None):
+    return merge_sketches(read_parquet_store(root, start_date, end_date))
+
+# Function to merge the per-batch sketch files of each day into a single file of one row per sketch
+def compact_sketches(root):
+    def combine(rows):
+        return pd.DataFrame([(day, name, sketch.to_bytes()) for day, day_rows in rows.groupby('Day')
+                             for name, sketch in merge_sketches(day_rows).items()], columns=['Day', 'sketch', 'state'])
+    compact_parquet_store(root, combine=combine)
@@ -0,0 +1,307 @@
+import os
+import sqlite3
+from contextlib import closing
+from urllib.request import pathname2url
+import numpy as np
+import pandas as pd
+from chart_data import histogram_bins
+from log_parsing import derived_columns, log_columns, log_schema, request_fields
+
+# SQLite store of parsed and enriched logs, one row per log in a single logs table. Times are kept as
+# whole seconds since the epoch and the IP address as its packed integer, so every column is an INTEGER
+# or TEXT. The dashboard's questions are asked as SQL over a date range, and only their answers,
+# counts per group, a few quantiles or a page of rows, are read into pandas
+sqlite_columns = log_columns + derived_columns
+time_columns = ['Timestamp Start', 'Timestamp End']
+integer_columns = ['IP Address', 'Status Code', 'Response Size', 'Session Duration'] + time_columns
+
+# Columns with an index of their own: the time range of every query and the filters of the dashboard
+indexed_columns = ['Timestamp Start', 'Country Code', 'Status Code', 'page']
+
+# Types of the columns read back, the same as the frames returned by enrich_logs
+sqlite_dtypes = {**log_schema, **{column: 'category' for column in request_fields + ['Browser', 'Device']}, 'Session Duration': 'int32'}
+
+# Function to quote a column name for SQL
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+# Function to tell whether a data source names a SQLite store
+def is_sqlite_store(path):
+    return path.endswith(('.db', '.sqlite', '.sqlite3'))
+
+# Function to open the store for writing, creating the table and its indexes the first time
+def connect_for_writing(path):
+    connection = sqlite3.connect(path)
+    # Readers keep reading while a batch is written
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    column_types = ', '.join(f'{quote(column)} {"INTEGER" if column in integer_columns else "TEXT"}' for column in sqlite_columns)
+    with connection:
+        connection.execute(f'CREATE TABLE IF NOT EXISTS logs ({column_types})')
+        for column in indexed_columns:
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {quote("logs " + column)} ON logs ({quote(column)})')
+    return connection
+
+# Function to open the store for reading only, so a missing store is an error instead of an empty new file
+def connect_for_reading(path):
+    return sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?mode=ro', uri=True)
+
+# Function to convert enriched logs to rows of Python values SQLite can store, missing values as None
+def sqlite_rows(cleaned_data):
+    columns = []
+    for column in sqlite_columns:
+        values = cleaned_data[column]
+        if column in time_columns:
+            columns.append((values.to_numpy().astype('int64') // 10 ** 9).tolist())
+        elif column in integer_columns:
+            columns.append(values.to_numpy().astype('int64').tolist())
+        else:
+            columns.append(values.astype(object).where(values.notna(), None).tolist())
+    return list(zip(*columns))
+
+# Function to add a batch of enriched logs to the store, batch_size rows per transaction
+def write_sqlite_store(cleaned_data, path, batch_size=50000):
+    if cleaned_data.empty:
+        return
+    insert = f'INSERT INTO logs ({", ".join(quote(column) for column in sqlite_columns)}) VALUES ({", ".join("?" * len(sqlite_columns))})'
+    with closing(connect_for_writing(path)) as connection:
+        for start in range(0, len(cleaned_data), batch_size):
+            rows = sqlite_rows(cleaned_data.iloc[start:start + batch_size])
+            with connection:
+                connection.executemany(insert, rows)
+
+# Function to turn rows read from the store into a frame of the same types as enrich_logs returns
+def rows_to_frame(rows, columns):
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for column in columns:
+        if column in time_columns:
+            frame[column] = pd.to_datetime(frame[column].astype('int64'), unit='s')
+        elif column in sqlite_dtypes:
+            frame[column] = frame[column].astype(sqlite_dtypes[column])
+    return frame
+
+# Function to tell whether the store changed since it was last looked at, from the size and modification
+# time of the database and of its write-ahead log, which every committed batch changes
+def sqlite_version(path):
+    version = []
+    for name in (path, path + '-wal'):
+        try:
+            stat = os.stat(name)
+        except FileNotFoundError:
+            continue
+        version.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(version)
+
+# Function to compute pandas-style quantiles, linearly interpolated, of values given as sorted distinct values and their counts
+def quantiles_from_counts(values, counts, quantiles):
+    values = np.asarray(values, dtype='float64')
+    cumulative = np.cumsum(counts)
+    results = []
+    for quantile in quantiles:
+        position = (cumulative[-1] - 1) * quantile
+        lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+        upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+        results.append(lower + (upper - lower) * (position - np.floor(position)))
+    return results
+
+# Function to summarize a numeric column like DataFrame.describe, from its sorted distinct values and their counts
+def describe_counts(values, counts):
+    total = counts.sum()
+    if total == 0:
+        return pd.Series([0] + [np.nan] * 7, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+    mean = np.average(values, weights=counts)
+    std = np.sqrt((counts * (values - mean) ** 2).sum() / (total - 1)) if total > 1 else np.nan
+    return pd.Series([float(total), mean, std, values[0]] + quantiles_from_counts(values, counts, (0.25, 0.5, 0.75)) + [values[-1]],
+                     index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+
+# Function to summarize a time column like DataFrame.describe, from its count and its mean, minimum,
+# quartiles and maximum in seconds since the epoch, or as timestamps already, None when there are no values
+def describe_seconds(count, mean, smallest, quartiles, largest):
+    summary = [mean, smallest] + list(quartiles) + [largest]
+    return pd.Series([count] + [pd.NaT if value is None else value if isinstance(value, pd.Timestamp) else pd.to_datetime(value, unit='s')
+                                for value in summary] + [np.nan],
+                     index=['count', 'mean', 'min', '25%', '50%', '75%', 'max', 'std'], dtype=object)
+
+# Function to put column summaries together like DataFrame.describe, in its order of rows when times are among them
+def describe_frame(summaries):
+    described = pd.DataFrame(summaries)
+    if any(column in time_columns for column in summaries):
+        described = described.reindex(['count', 'mean', 'min', '25%', '50%', '75%', 'max', 'std'])
+    return described
+
+# Logs of a SQLite store between two dates, queried lazily. Slicing it by time or selecting columns
+# returns another view; the query methods answer over the rows of the view, optionally only those where a
+# column equals a value, given as a (column, value) pair
+class SqliteLogView:
+    def __init__(self, path, start_date=None, end_date=None, columns=None):
+        self.path = path
+        self.start_date = start_date
+        self.end_date = end_date
+        self.columns = list(columns) if columns is not None else list(sqlite_columns)
+        self.narrow = None  # whether the time range is narrow enough to read through the index
+
+    def __getitem__(self, columns):
+        return SqliteLogView(self.path, self.start_date, self.end_date, columns)
+
+    def __len__(self):
+        return self.row_count()
+
+    # Function to narrow the view down to the times from the start of start_date to the end of end_date
+    def time_slice(self, start_date=None, end_date=None):
+        start_date = start_date if start_date is not None else self.start_date
+        end_date = end_date if end_date is not None else self.end_date
+        return SqliteLogView(self.path, start_date, end_date, self.columns)
+
+    # Function to return the time range as whole seconds, None for an open end
+    def time_range(self):
+        start = None if self.start_date is None else int(pd.Timestamp(self.start_date).timestamp())
+        end = None if self.end_date is None else int((pd.Timestamp(self.end_date) + pd.Timedelta(days=1)).timestamp())
+        return start, end
+
+    # Function to tell whether the time range holds few enough of the logs to find them through the index.
+    # Reading most of the table through it costs a lookup per row and is slower than scanning the table,
+    # so the index is only used for ranges with under a quarter of the logs. Counting both only reads indexes
+    def is_narrow(self):
+        if self.narrow is None:
+            start, end = self.time_range()
+            in_range, total = self.query(f'SELECT (SELECT COUNT(*) FROM logs WHERE {quote("Timestamp Start")} >= ? AND {quote("Timestamp Start")} < ?), '
+                                         f'(SELECT COUNT(*) FROM logs)', [start if start is not None else -2 ** 63, end if end is not None else 2 ** 63 - 1])[0]
+            self.narrow = in_range * 4 < total
+        return self.narrow
+
+    # Function to build the WHERE clause of the view's time range and an optional (column, value) condition
+    def where(self, condition=None):
+        clauses, parameters = ['1'], []
+        start, end = self.time_range()
+        if start is not None or end is not None:
+            # A unary + keeps SQLite from using the index on the column
+            column = quote("Timestamp Start") if self.is_narrow() else '+' + quote("Timestamp Start")
+            if start is not None:
+                clauses.append(f'{column} >= ?')
+                parameters.append(start)
+            if end is not None:
+                clauses.append(f'{column} < ?')
+                parameters.append(end)
+        if condition is not None:
+            clauses.append(f'{quote(condition[0])} = ?')
+            parameters.append(condition[1])
+        return ' AND '.join(clauses), parameters
+
+    def query(self, sql, parameters=()):
+        with closing(connect_for_reading(self.path)) as connection:
+            return connection.execute(sql, parameters).fetchall()
+
+    def row_count(self, condition=None):
+        where, parameters = self.where(condition)
+        return self.query(f'SELECT COUNT(*) FROM logs WHERE {where}', parameters)[0][0]
+
+    def distinct_count(self, column):
+        where, parameters = self.where()
+        return self.query(f'SELECT COUNT(DISTINCT {quote(column)}) FROM logs WHERE {where}', parameters)[0][0]
+
+    # Function to count the rows of each value of a column, most common first like value_counts
+    def value_counts(self, column, condition=None):
+        where, parameters = self.where(condition)
+        rows = self.query(f'SELECT {quote(column)}, COUNT(*) FROM logs WHERE {where} AND {quote(column)} IS NOT NULL '
+                          f'GROUP BY 1 ORDER BY 2 DESC, 1', parameters)
+        return pd.Series([count for _, count in rows], index=pd.Index([value for value, _ in rows], name=column), name='count', dtype='int64')
+
+    # Function to count the rows of each value of a column, in order of the values like groupby().size()
+    def group_sizes(self, column):
+        return self.value_counts(column).sort_index()
+
+    # Function to average a column over the rows of each value of another, like groupby()[column].mean()
+    def mean_by(self, by, column, condition=None):
+        where, parameters = self.where(condition)
+        rows = self.query(f'SELECT {quote(by)}, AVG({quote(column)}) FROM logs WHERE {where} AND {quote(by)} IS NOT NULL '
+                          f'GROUP BY 1 ORDER BY 1', parameters)
+        return pd.Series([mean for _, mean in rows], index=pd.Index([value for value, _ in rows], name=by), name=column, dtype='float64')
+
+    # Function to return each distinct value of a numeric column with its number of rows, sorted by value
+    def distinct_values(self, column):
+        where, parameters = self.where()
+        rows = self.query(f'SELECT {quote(column)}, COUNT(*) FROM logs WHERE {where} AND {quote(column)} IS NOT NULL '
+                          f'GROUP BY 1 ORDER BY 1', parameters)
+        return np.array([value for value, _ in rows], dtype='float64'), np.array([count for _, count in rows], dtype='int64')
+
+    # Function to count a numeric column into equal-width bins like histogram_bins, from its distinct values
+    def histogram(self, column, nbins=50):
+        values, counts = self.distinct_values(column)
+        if len(values) == 0:
+            return histogram_bins([], nbins)
+        bin_counts, edges = np.histogram(values, bins=nbins, weights=counts)
+        return pd.DataFrame({'center': (edges[:-1] + edges[1:]) / 2, 'left': edges[:-1], 'right': edges[1:], 'count': bin_counts.astype('int64')})
+
+    # Function to summarize the numeric and time columns like DataFrame.describe. Numbers are summarized
+    # from their distinct values; the quartiles of times are read through the ordered rows
+    def describe(self, exclude=()):
+        where, parameters = self.where()
+        summaries = {}
+        for column in self.columns:
+            if column in exclude or column not in integer_columns:
+                continue
+            if column in time_columns:
+                count, mean, smallest, largest = self.query(f'SELECT COUNT({quote(column)}), AVG({quote(column)}), MIN({quote(column)}), MAX({quote(column)}) '
+                                                            f'FROM logs WHERE {where}', parameters)[0]
+                summaries[column] = describe_seconds(count, mean, smallest, self.time_quantiles(column, (0.25, 0.5, 0.75), count), largest)
+                continue
+            summaries[column] = describe_counts(*self.distinct_values(column))
+        return describe_frame(summaries)
+
+    # Function to find quantiles of a time column, linearly interpolated, from the rows around each of them
+    # in a single ordered pass over the column
+    def time_quantiles(self, column, quantiles, count):
+        if not count:
+            return [None] * len(quantiles)
+        positions = [(count - 1) * quantile for quantile in quantiles]
+        numbers = sorted({int(np.floor(position)) + offset + 1 for position in positions for offset in (0, 1)})
+        where, parameters = self.where()
+        rows = dict(self.query(f'SELECT number, value FROM (SELECT ROW_NUMBER() OVER (ORDER BY {quote(column)}) AS number, {quote(column)} AS value '
+                               f'FROM logs WHERE {where} AND {quote(column)} IS NOT NULL) WHERE number IN ({", ".join("?" * len(numbers))})',
+                               parameters + numbers))
+        results = []
+        for position in positions:
+            lower = rows[int(np.floor(position)) + 1]
+            upper = rows.get(int(np.floor(position)) + 2, lower)
+            results.append(lower + (upper - lower) * (position - np.floor(position)))
+        return results
+
+    # Function to return the number of logs and the sum of their session durations
+    def totals(self):
+        where, parameters = self.where()
+        count, duration = self.query(f'SELECT COUNT(*), SUM({quote("Session Duration")}) FROM logs WHERE {where}', parameters)[0]
+        return count, duration or 0
+
+    # Function to count the logs of each hour, and of each value of a column within it when given, like
+    # a rollup with only those dimensions. Its size depends on the time range, not on the number of logs
+    def hourly_counts(self, by=None):
+        where, parameters = self.where()
+        keys = [f'{quote("Timestamp Start")} / 3600 * 3600'] + ([quote(by)] if by else [])
+        rows = self.query(f'SELECT {", ".join(keys)}, COUNT(*) FROM logs WHERE {where}{f" AND {quote(by)} IS NOT NULL" if by else ""} '
+                          f'GROUP BY {", ".join(str(key) for key in range(1, len(keys) + 1))} ORDER BY 1', parameters)
+        counts = pd.DataFrame.from_records(rows, columns=['Hour'] + ([by] if by else []) + ['count'])
+        counts['Hour'] = pd.to_datetime(counts['Hour'].astype('int64'), unit='s')
+        return counts.astype({'count': 'int64'})
+
+    # Function to return the first n rows of the view, in order of time
+    def head(self, n=5):
+        where, parameters = self.where()
+        rows = self.query(f'SELECT {", ".join(quote(column) for column in self.columns)} FROM logs WHERE {where} '
+                          f'ORDER BY {quote("Timestamp Start")}, rowid LIMIT ?', parameters + [n])
+        return rows_to_frame(rows, self.columns)
+
+    # Function to yield the rows of the view in order of time, chunk_size rows at a time; at least one, maybe empty, frame.
+    # Each chunk continues after the last row of the previous one, so no chunk re-reads the rows before it
+    def chunks(self, chunk_size):
+        where, parameters = self.where()
+        select = f'SELECT rowid, {", ".join(quote(column) for column in self.columns + ["Timestamp Start"])} FROM logs WHERE {where}'
+        order = f'ORDER BY {quote("Timestamp Start")}, rowid LIMIT {int(chunk_size)}'
+        rows = self.query(f'{select} {order}', parameters)
+        while True:
+            yield rows_to_frame([row[1:-1] for row in rows], self.columns)
+            if len(rows) < chunk_size:
+                return
+            last_rowid, last_time = rows[-1][0], rows[-1][-1]
+            rows = self.query(f'{select} AND ({quote("Timestamp Start")}, rowid) > (?, ?) {order}', parameters + [last_time, last_rowid])
+            if not rows:
+                return
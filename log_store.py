@@ -0,0 +1,167 @@
+import csv
+import glob
+import io
+import os
+import threading
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Serializes appends from concurrent fetches, so repair_tail never mistakes a write in progress for a torn one
+append_lock = threading.Lock()
+
+# Function to list the rotated segments of a log file, oldest first, followed by the live file
+def log_segments(path):
+    rotated = []
+    for name in glob.glob(glob.escape(path) + ".*"):
+        suffix = name[len(path) + 1:]
+        if suffix.isdigit():
+            rotated.append((int(suffix), name))
+    segments = [name for _, name in sorted(rotated)]
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+# Function to fsync a directory so renames and new files in it survive a crash
+def fsync_directory(path):
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Function to cut off a partially written last line, left behind by a crash during an append
+def repair_tail(path, block_size=65536):
+    try:
+        log_file = open(path, "r+b")
+    except FileNotFoundError:
+        return 0
+
+    with log_file:
+        size = log_file.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        log_file.seek(size - 1)
+        if log_file.read(1) == b"\n":
+            return 0
+
+        # Walk back to the end of the last complete line
+        keep = 0
+        position = size
+        while position > 0:
+            start = max(0, position - block_size)
+            log_file.seek(start)
+            newline = log_file.read(position - start).rfind(b"\n")
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            position = start
+
+        log_file.truncate(keep)
+        log_file.flush()
+        os.fsync(log_file.fileno())
+        print(f"Dropped {size - keep} bytes of an incomplete write from {path}")
+        return size - keep
+
+# Function to move the live log file aside as the next numbered segment
+def rotate_log(path):
+    segments = log_segments(path)
+    numbers = [int(name[len(path) + 1:]) for name in segments if name != path]
+    rotated = f"{path}.{max(numbers, default=0) + 1}"
+    os.rename(path, rotated)
+    fsync_directory(path)
+    print(f"Rotated {path} to {rotated}")
+    return rotated
+
+# Function to append raw logs to the CSV file. The cost only depends on the size of the batch:
+# the batch is written with a single O_APPEND write and fsynced, so existing history is never rewritten
+def append_logs(raw_logs, path, rotate_bytes=None):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows([raw_log] for raw_log in raw_logs)
+    data = buffer.getvalue().encode("utf-8")
+    if not data:
+        return 0
+
+    with append_lock:
+        repair_tail(path)
+        if rotate_bytes and os.path.exists(path):
+            size = os.path.getsize(path)
+            if size > 0 and size + len(data) > rotate_bytes:
+                rotate_log(path)
+
+        created = not os.path.exists(path)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if created:
+            fsync_directory(path)
+    return len(data)
+
+# Parquet store partitioned by the day of Timestamp Start, one day=YYYY-MM-DD directory per day
+day_partitioning = ds.partitioning(pa.schema([('day', pa.date32())]), flavor='hive')
+
+# Function to add a batch of parsed logs to the Parquet store, as new files in each day it touches.
+# Other frames can be stored the same way by naming the datetime column to partition them on
+def write_parquet_store(cleaned_data, root, time_column='Timestamp Start'):
+    if cleaned_data.empty:
+        return
+    table = pa.Table.from_pandas(cleaned_data.assign(day=cleaned_data[time_column].dt.date), preserve_index=False)
+    ds.write_dataset(table, root, format='parquet', partitioning=day_partitioning,
+                     basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+
+# Function to read the Parquet store, only opening the days in [start_date, end_date] and the requested columns
+def read_parquet_store(root, start_date=None, end_date=None, columns=None):
+    dataset = ds.dataset(root, format='parquet', partitioning=day_partitioning)
+    day_filter = None
+    if start_date is not None:
+        day_filter = ds.field('day') >= pa.scalar(as_date(start_date), pa.date32())
+    if end_date is not None:
+        end_filter = ds.field('day') <= pa.scalar(as_date(end_date), pa.date32())
+        day_filter = end_filter if day_filter is None else day_filter & end_filter
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'day']
+    return dataset.to_table(columns=columns, filter=day_filter).to_pandas()
+
+# Function to turn a date, datetime or Timestamp into a date
+def as_date(value):
+    return value.date() if hasattr(value, 'date') else value
+
+# Function to tell whether a store changed since it was last looked at: the number of files under root
+# and the newest modification time. Every write and compaction of the store changes it
+def store_version(root):
+    count, newest = 0, 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            try:
+                modified = os.stat(os.path.join(directory, name)).st_mtime_ns
+            except FileNotFoundError:
+                continue  # removed by a compaction in the meantime
+            count += 1
+            newest = max(newest, modified)
+    return count, newest
+
+# Function to merge the small per-batch files of each day into a single file.
+# `combine`, if given, is applied to the merged rows of a day as a DataFrame before they are written back
+def compact_parquet_store(root, combine=None):
+    for partition in sorted(glob.glob(os.path.join(root, 'day=*'))):
+        parts = sorted(glob.glob(os.path.join(partition, '*.parquet')))
+        if len(parts) < 2:
+            continue
+        table = pa.concat_tables([pq.read_table(part) for part in parts])
+        if combine is not None:
+            table = pa.Table.from_pandas(combine(table.to_pandas()), preserve_index=False)
+        name = f'part-{uuid.uuid4().hex}-0.parquet'
+        # Written under a dot name, which dataset discovery skips, then renamed into place.
+        # The old files go only once the new one exists, so a crash can duplicate rows but never lose them
+        temporary = os.path.join(partition, f'.{name}.tmp')
+        pq.write_table(table, temporary)
+        os.replace(temporary, os.path.join(partition, name))
+        for part in parts:
+            os.remove(part)
@@ -1,188 +1,533 @@
-from flask import Flask, jsonify, request
-import random
-from datetime import datetime, timedelta
-import random
-
-app = Flask(__name__)
-
-# Define weighted probabilities for countries
-countries_weights = {
-    'US': 600,
-    'IN': 470,
-    'CN': 300,
-    'BR': 230,
-    'RU': 180,
-    'JP': 130,
-    'DE': 110,
-    'ID': 110,
-    'NG': 400,
-    'PK': 120,
-    'MX': 100,
-    'FR': 90,
-    'IT': 80,
-    'KR': 70,
-    'TR': 60,
-    'GB': 50,
-    'IR': 40,
-    'TH': 30,
-    'EG': 25,
-    'VN': 20,
-    'AR': 15,
-    'PH': 10,
-    'ES': 5,
-    'CA': 3,
-    'SA': 2
-}
-
-# Define weighted probabilities for status codes
-status_codes_weights = {
-    200: 400,
-    301: 20,
-    404: 150,
-    500: 50,
-    
-}
-
-# Define weighted probabilities for traffic sources
-traffic_sources_weights = {
-    'Organic Search': 300,
-    'Facebook': 200,
-    'Paid Advertising': 150,
-    'Tik tok': 120,
-    'Twitter': 100,
-    'Youtube': 50
-}
-
-# Define weighted probabilities for pages
-pages_weights = {
-    '/home': 150,
-    '/sports': 200,
-    '/olympic-channel': 300,
-    '/news': 30,
-    '/schedule': 5
-}
-
-# Define weighted probabilities for sports events
-sports_events_weights = {
-    'Athletics': 300,
-    'Basketball': 100,
-    'Badminton': 80,
-    'Cricket': 120,
-    'Diving': 70,
-    'Fencing': 90,
-    'Football': 200,
-    'Golf': 40,
-    'hockey': 150,
-    'Gymnastics': 100,
-    'karate': 60,
-    'Swimming': 110,
-    'Tennis': 130,
-    'Volleyball': 80,
-    'Weightlifting': 70
-}
-
-
-# List of example HTTP methods
-http_methods = ['GET', 'POST']
-
-# Define user agents
-user_agents = [
-    # Windows Browsers
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:59.0) Gecko/20100101 Firefox/59.0",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/17.17134 Safari/537.36",
-    # macOS Browsers
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/11.1.2 Safari/605.1.15",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/66.0.3359.181 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Firefox/61.0",
-    # Linux Browsers
-    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:61.0) Gecko/20100101 Firefox/61.0",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/67.0.3396.99 Safari/537.36",
-    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:61.0) Gecko/20100101 Firefox/61.0",
-    # Mobile Browsers
-    "Mozilla/5.0 (Linux; Android 8.0.0; SM-G960F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.157 Mobile Safari/537.36",
-    "Mozilla/5.0 (iPhone; CPU iPhone OS 11_2_6 like Mac OS X) AppleWebKit/604.5.6 (KHTML, like Gecko) Version/11.0 Mobile/15D100 Safari/604.1",
-    "Mozilla/5.0 (Linux; Android 9; SM-G960F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.157 Mobile Safari/537.36",
-    # Tablet Browsers
-    "Mozilla/5.0 (iPad; CPU OS 12_3_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/12.1.1 Mobile/15E148 Safari/604.1",  # iPad
-    "Mozilla/5.0 (Linux; Android 8.0.0; SM-T350 Build/NRD90M) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/75.0.3770.101 Safari/537.36",  # Android Tablet
-    "Mozilla/5.0 (Linux; Android 9; SM-T350) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/75.0.3770.101 Safari/537.36"  # Android Tablet
-]
-
-# Function to randomly select an item based on weighted probabilities
-def weighted_random(weights):
-    total_weight = sum(weights.values())
-    rand = random.uniform(0, total_weight)
-    for item, weight in weights.items():
-        rand -= weight
-        if rand <= 0:
-            return item
-
-# Function to generate a single log entry within a specific date range
-def generate_raw_log_entry(start_date, end_date):
-    ip_address = '.'.join(str(random.randint(0, 255)) for _ in range(4))
-    country_code = weighted_random(countries_weights)
-    status_code = weighted_random(status_codes_weights)
-    traffic_source = weighted_random(traffic_sources_weights)
-    sports_event = weighted_random(sports_events_weights)
-
-    timestamp_start = (start_date + timedelta(seconds=random.randint(0, int((end_date - start_date).total_seconds())))).strftime("%d/%b/%Y:%H:%M:%S")
-    session_duration = random.randint(60, 3600)  # Random session duration between 1 minute and 1 hour (in seconds)
-    timestamp_end = (datetime.strptime(timestamp_start, "%d/%b/%Y:%H:%M:%S") + timedelta(seconds=session_duration)).strftime("%d/%b/%Y:%H:%M:%S")
-    http_method = random.choice(http_methods)
-    page = weighted_random(pages_weights)
-    request = f'{http_method} {page} HTTP/1.1'
-
-    if page == '/home':
-        if random.random() < 0.3:  # 20% chance of accessing upcoming events
-            request = 'GET /home/upcoming-events HTTP/1.1'
-        elif random.random() < 0.45:  # 20% chance of accessing popular videos
-            request = 'GET /home/popular-videos HTTP/1.1'
-        elif random.random() < 0.6:  # 20% chance of accessing news updates
-            request = 'GET /home/news-updates HTTP/1.1'
-        else: 
-            request = 'GET /home/highlights HTTP/1.1' 
-    elif page == '/olympic-channel':
-        sports_event = weighted_random(sports_events_weights)
-        if random.random() < 0.5:  # 50% chance of joining/ watching live stream sessions  
-            request = f'POST /olympic-channel/live-stream/{sports_event} HTTP/1.1'
-        elif random.random() < 0.75:  # 25% chance of interacting with live chat, polls, or reactions that are related to the sport being live streamed
-            request = random.choice([f'POST /olympic-channel/live-stream/{sports_event}/chat HTTP/1.1', f'POST /olympic-channel/live-stream/{sports_event}/poll HTTP/1.1', f'POST /olympic-channel/live-stream/{sports_event}/share-reaction HTTP/1.1'])
-        else:  # 50% chance of ending live stream
-            request = f'POST /olympic-channel/live-stream/{sports_event}/end HTTP/1.1'  # Example: Ending live stream for a specific sport
-    elif page == '/sports':
-        if random.random() < 0.2:   # 20% chance of browsing sports categories
-            sports_event = weighted_random(sports_events_weights)
-            request = f'GET /sports/{sports_event} HTTP/1.1'
-        elif random.random() < 0.3:  # 10% chance of checking the schedule
-            request = 'GET /sports/schedule HTTP/1.1'
-        else:  # 40% chance of favoriting or following specific sports
-            sports_event = weighted_random(sports_events_weights)
-            request = f'POST /sports/{sports_event}/favorite HTTP/1.1'
-
-    response_size = random.randint(100, 1000)
-    user_agent = random.choice(user_agents)
-    return f"{ip_address} - - [{timestamp_start}] - [{timestamp_end}]\"{request}\" {status_code} {response_size} \"{user_agent}\" \"{country_code}\" \"{traffic_source}\""
-
-# Function to generate logs within a specific date range
-def generate_raw_logs(start_date, end_date, num_logs):
-    raw_logs = []
-    for _ in range(num_logs):
-        raw_log_entry = generate_raw_log_entry(start_date, end_date)
-        raw_logs.append(raw_log_entry)
-    return raw_logs
-
-@app.route('/')
-def index():
-    return "Welcome to the Payris fun Olympic API. To access logs, please visit the '/generate-logs' endpoint."
-
-@app.route('/generate-logs', methods=['GET'])
-def get_raw_logs():
-    start_date = datetime(2024, 5, 30)
-    end_date = datetime(2024, 8, 30)
-    count = int(request.args.get('count', random.randint(300, 5000)))  # Get the count parameter from the request, default to a random value between 50 and 200
-    raw_logs = generate_raw_logs(start_date, end_date, count)
-    return jsonify(raw_logs)
-
-if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+from flask import Flask, Response, g, jsonify, request
+import argparse
+import csv
+import gzip
+import io
+import random
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import chain, repeat
+import numpy as np
+import pyarrow as pa
+from instrumentation import MetricsRegistry
+from log_arrow import log_arrow_schema
+
+app = Flask(__name__)
+
+# Served in the Prometheus text format on /metrics
+metrics = MetricsRegistry()
+metrics.describe('olympic_logs_generated_total', 'counter', 'Log entries generated, by endpoint.')
+metrics.describe('olympic_http_request_duration_seconds', 'histogram', 'Time from receiving a request to sending the last byte of its response.')
+metrics.describe('olympic_http_response_bytes_total', 'counter', 'Bytes of response bodies sent, after compression.')
+
+# Define weighted probabilities for countries
+countries_weights = {
+    'US': 600,
+    'IN': 470,
+    'CN': 300,
+    'BR': 230,
+    'RU': 180,
+    'JP': 130,
+    'DE': 110,
+    'ID': 110,
+    'NG': 400,
+    'PK': 120,
+    'MX': 100,
+    'FR': 90,
+    'IT': 80,
+    'KR': 70,
+    'TR': 60,
+    'GB': 50,
+    'IR': 40,
+    'TH': 30,
+    'EG': 25,
+    'VN': 20,
+    'AR': 15,
+    'PH': 10,
+    'ES': 5,
+    'CA': 3,
+    'SA': 2
+}
+
+# Define weighted probabilities for status codes
+status_codes_weights = {
+    200: 400,
+    301: 20,
+    404: 150,
+    500: 50,
+    
+}
+
+# Define weighted probabilities for traffic sources
+traffic_sources_weights = {
+    'Organic Search': 300,
+    'Facebook': 200,
+    'Paid Advertising': 150,
+    'Tik tok': 120,
+    'Twitter': 100,
+    'Youtube': 50
+}
+
+# Define weighted probabilities for pages
+pages_weights = {
+    '/home': 150,
+    '/sports': 200,
+    '/olympic-channel': 300,
+    '/news': 30,
+    '/schedule': 5
+}
+
+# Define weighted probabilities for sports events
+sports_events_weights = {
+    'Athletics': 300,
+    'Basketball': 100,
+    'Badminton': 80,
+    'Cricket': 120,
+    'Diving': 70,
+    'Fencing': 90,
+    'Football': 200,
+    'Golf': 40,
+    'hockey': 150,
+    'Gymnastics': 100,
+    'karate': 60,
+    'Swimming': 110,
+    'Tennis': 130,
+    'Volleyball': 80,
+    'Weightlifting': 70
+}
+
+
+# List of example HTTP methods
+http_methods = ['GET', 'POST']
+
+# Define user agents
+user_agents = [
+    # Windows Browsers
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:59.0) Gecko/20100101 Firefox/59.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/17.17134 Safari/537.36",
+    # macOS Browsers
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/11.1.2 Safari/605.1.15",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/66.0.3359.181 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Firefox/61.0",
+    # Linux Browsers
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:61.0) Gecko/20100101 Firefox/61.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/67.0.3396.99 Safari/537.36",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:61.0) Gecko/20100101 Firefox/61.0",
+    # Mobile Browsers
+    "Mozilla/5.0 (Linux; Android 8.0.0; SM-G960F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.157 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 11_2_6 like Mac OS X) AppleWebKit/604.5.6 (KHTML, like Gecko) Version/11.0 Mobile/15D100 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 9; SM-G960F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.157 Mobile Safari/537.36",
+    # Tablet Browsers
+    "Mozilla/5.0 (iPad; CPU OS 12_3_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/12.1.1 Mobile/15E148 Safari/604.1",  # iPad
+    "Mozilla/5.0 (Linux; Android 8.0.0; SM-T350 Build/NRD90M) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/75.0.3770.101 Safari/537.36",  # Android Tablet
+    "Mozilla/5.0 (Linux; Android 9; SM-T350) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/75.0.3770.101 Safari/537.36"  # Android Tablet
+]
+
+# Function to randomly select an item based on weighted probabilities
+def weighted_random(weights):
+    total_weight = sum(weights.values())
+    rand = random.uniform(0, total_weight)
+    for item, weight in weights.items():
+        rand -= weight
+        if rand <= 0:
+            return item
+
+# Function to generate a single log entry within a specific date range
+def generate_raw_log_entry(start_date, end_date):
+    ip_address = '.'.join(str(random.randint(0, 255)) for _ in range(4))
+    country_code = weighted_random(countries_weights)
+    status_code = weighted_random(status_codes_weights)
+    traffic_source = weighted_random(traffic_sources_weights)
+    sports_event = weighted_random(sports_events_weights)
+
+    timestamp_start = (start_date + timedelta(seconds=random.randint(0, int((end_date - start_date).total_seconds())))).strftime("%d/%b/%Y:%H:%M:%S")
+    session_duration = random.randint(60, 3600)  # Random session duration between 1 minute and 1 hour (in seconds)
+    timestamp_end = (datetime.strptime(timestamp_start, "%d/%b/%Y:%H:%M:%S") + timedelta(seconds=session_duration)).strftime("%d/%b/%Y:%H:%M:%S")
+    http_method = random.choice(http_methods)
+    page = weighted_random(pages_weights)
+    request = f'{http_method} {page} HTTP/1.1'
+
+    if page == '/home':
+        if random.random() < 0.3:  # 20% chance of accessing upcoming events
+            request = 'GET /home/upcoming-events HTTP/1.1'
+        elif random.random() < 0.45:  # 20% chance of accessing popular videos
+            request = 'GET /home/popular-videos HTTP/1.1'
+        elif random.random() < 0.6:  # 20% chance of accessing news updates
+            request = 'GET /home/news-updates HTTP/1.1'
+        else: 
+            request = 'GET /home/highlights HTTP/1.1' 
+    elif page == '/olympic-channel':
+        sports_event = weighted_random(sports_events_weights)
+        if random.random() < 0.5:  # 50% chance of joining/ watching live stream sessions  
+            request = f'POST /olympic-channel/live-stream/{sports_event} HTTP/1.1'
+        elif random.random() < 0.75:  # 25% chance of interacting with live chat, polls, or reactions that are related to the sport being live streamed
+            request = random.choice([f'POST /olympic-channel/live-stream/{sports_event}/chat HTTP/1.1', f'POST /olympic-channel/live-stream/{sports_event}/poll HTTP/1.1', f'POST /olympic-channel/live-stream/{sports_event}/share-reaction HTTP/1.1'])
+        else:  # 50% chance of ending live stream
+            request = f'POST /olympic-channel/live-stream/{sports_event}/end HTTP/1.1'  # Example: Ending live stream for a specific sport
+    elif page == '/sports':
+        if random.random() < 0.2:   # 20% chance of browsing sports categories
+            sports_event = weighted_random(sports_events_weights)
+            request = f'GET /sports/{sports_event} HTTP/1.1'
+        elif random.random() < 0.3:  # 10% chance of checking the schedule
+            request = 'GET /sports/schedule HTTP/1.1'
+        else:  # 40% chance of favoriting or following specific sports
+            sports_event = weighted_random(sports_events_weights)
+            request = f'POST /sports/{sports_event}/favorite HTTP/1.1'
+
+    response_size = random.randint(100, 1000)
+    user_agent = random.choice(user_agents)
+    return f"{ip_address} - - [{timestamp_start}] - [{timestamp_end}]\"{request}\" {status_code} {response_size} \"{user_agent}\" \"{country_code}\" \"{traffic_source}\""
+
+# Function to generate logs within a specific date range
+def generate_raw_logs(start_date, end_date, num_logs):
+    raw_logs = []
+    for _ in range(num_logs):
+        raw_log_entry = generate_raw_log_entry(start_date, end_date)
+        raw_logs.append(raw_log_entry)
+    return raw_logs
+
+# Lookup tables for the vectorized engine: labels alongside the cumulative weights
+def _cumulative_table(weights):
+    labels = np.array(list(weights.keys()), dtype=object)
+    cumulative = np.cumsum(np.fromiter(weights.values(), dtype=float, count=len(weights)))
+    return labels, cumulative
+
+countries_table = _cumulative_table(countries_weights)
+status_codes_table = _cumulative_table(status_codes_weights)
+traffic_sources_table = _cumulative_table(traffic_sources_weights)
+pages_table = _cumulative_table(pages_weights)
+sports_events_table = _cumulative_table(sports_events_weights)
+
+# Same selection rule as weighted_random, for n draws at once
+def weighted_random_indices(rng, table, n):
+    _, cumulative = table
+    return np.searchsorted(cumulative, rng.uniform(0, cumulative[-1], n))
+
+# Request paths by branch, indexed by sports event position in sports_events_table
+sports_labels = sports_events_table[0]
+plain_requests = np.array([[f'{method} {page} HTTP/1.1' for page in pages_table[0]] for method in http_methods], dtype=object)
+home_requests = np.array(['GET /home/upcoming-events HTTP/1.1', 'GET /home/popular-videos HTTP/1.1', 'GET /home/news-updates HTTP/1.1', 'GET /home/highlights HTTP/1.1'], dtype=object)
+live_stream_requests = np.array([f'POST /olympic-channel/live-stream/{sport} HTTP/1.1' for sport in sports_labels], dtype=object)
+live_stream_interaction_requests = np.array([[f'POST /olympic-channel/live-stream/{sport}/{interaction} HTTP/1.1' for sport in sports_labels] for interaction in ('chat', 'poll', 'share-reaction')], dtype=object)
+live_stream_end_requests = np.array([f'POST /olympic-channel/live-stream/{sport}/end HTTP/1.1' for sport in sports_labels], dtype=object)
+sports_category_requests = np.array([f'GET /sports/{sport} HTTP/1.1' for sport in sports_labels], dtype=object)
+sports_favorite_requests = np.array([f'POST /sports/{sport}/favorite HTTP/1.1' for sport in sports_labels], dtype=object)
+
+# Time of day strings for every second of a day, built once
+@lru_cache(maxsize=1)
+def time_of_day_labels():
+    return np.array([f'{second // 3600:02}:{second // 60 % 60:02}:{second % 60:02}' for second in range(86400)], dtype=object)
+
+# Function to draw every field of num_logs entries at once
+def generate_log_fields(start_date, end_date, num_logs, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    n = num_logs
+
+    # Timestamps are kept as seconds since midnight of the start day
+    day_start = datetime(start_date.year, start_date.month, start_date.day)
+    start_offset = int((start_date - day_start).total_seconds())
+    span = int((end_date - start_date).total_seconds())
+    start_seconds = start_offset + rng.integers(0, span, n, endpoint=True)
+    session_duration = rng.integers(60, 3600, n, endpoint=True)
+
+    page_index = weighted_random_indices(rng, pages_table, n)
+    sport_index = weighted_random_indices(rng, sports_events_table, n)
+    method_index = rng.integers(0, len(http_methods), n)
+    branch = rng.random((3, n))
+
+    page_labels = pages_table[0]
+    request_paths = plain_requests[method_index, page_index]
+
+    # Same branching as generate_raw_log_entry, one mask per page
+    home = page_labels[page_index] == '/home'
+    home_choice = np.select([branch[0] < 0.3, branch[1] < 0.45, branch[2] < 0.6], [0, 1, 2], 3)
+    request_paths[home] = home_requests[home_choice[home]]
+
+    olympic_channel = page_labels[page_index] == '/olympic-channel'
+    live = olympic_channel & (branch[0] < 0.5)
+    interaction = olympic_channel & ~live & (branch[1] < 0.75)
+    ended = olympic_channel & ~live & ~interaction
+    interaction_type = rng.integers(0, 3, n)
+    request_paths[live] = live_stream_requests[sport_index[live]]
+    request_paths[interaction] = live_stream_interaction_requests[interaction_type[interaction], sport_index[interaction]]
+    request_paths[ended] = live_stream_end_requests[sport_index[ended]]
+
+    sports = page_labels[page_index] == '/sports'
+    category = sports & (branch[0] < 0.2)
+    schedule = sports & ~category & (branch[1] < 0.3)
+    favorite = sports & ~category & ~schedule
+    request_paths[category] = sports_category_requests[sport_index[category]]
+    request_paths[schedule] = 'GET /sports/schedule HTTP/1.1'
+    request_paths[favorite] = sports_favorite_requests[sport_index[favorite]]
+
+    return {
+        'ip_octets': rng.integers(0, 256, (n, 4)),
+        'day_start': day_start,
+        'start_seconds': start_seconds,
+        'end_seconds': start_seconds + session_duration,
+        'request': request_paths,
+        'status_code': status_codes_table[0][weighted_random_indices(rng, status_codes_table, n)],
+        'response_size': rng.integers(100, 1000, n, endpoint=True),
+        'user_agent': rng.choice(np.array(user_agents, dtype=object), n),
+        'country_code': countries_table[0][weighted_random_indices(rng, countries_table, n)],
+        'traffic_source': traffic_sources_table[0][weighted_random_indices(rng, traffic_sources_table, n)],
+    }
+
+# Function to look up the day and time of day labels of timestamps given as seconds since day_start
+def timestamp_labels(day_start, seconds):
+    days = seconds // 86400
+    day_labels = np.array([(day_start + timedelta(days=int(day))).strftime("%d/%b/%Y") for day in range(int(days.max(initial=0)) + 1)], dtype=object)
+    return day_labels[days].tolist(), time_of_day_labels()[seconds % 86400].tolist()
+
+# Function to assemble log strings from generated fields
+def format_raw_logs(fields):
+    octet_labels = np.array([str(octet) for octet in range(256)], dtype=object)
+    octets = octet_labels[fields['ip_octets']]
+    start_days, start_times = timestamp_labels(fields['day_start'], fields['start_seconds'])
+    end_days, end_times = timestamp_labels(fields['day_start'], fields['end_seconds'])
+    columns = zip(octets[:, 0].tolist(), octets[:, 1].tolist(), octets[:, 2].tolist(), octets[:, 3].tolist(),
+                  start_days, start_times, end_days, end_times, fields['request'].tolist(),
+                  fields['status_code'].tolist(), fields['response_size'].tolist(), fields['user_agent'].tolist(),
+                  fields['country_code'].tolist(), fields['traffic_source'].tolist())
+    return [f"{a}.{b}.{c}.{d} - - [{start_day}:{start_time}] - [{end_day}:{end_time}]\"{request}\" {status_code} {response_size} \"{user_agent}\" \"{country_code}\" \"{traffic_source}\""
+            for a, b, c, d, start_day, start_time, end_day, end_time, request, status_code, response_size, user_agent, country_code, traffic_source in columns]
+
+# Function to generate logs within a specific date range with the vectorized engine
+def generate_raw_logs_vectorized(start_date, end_date, num_logs, rng=None):
+    return format_raw_logs(generate_log_fields(start_date, end_date, num_logs, rng))
+
+# Function to put generated fields into an Arrow record batch of the typed columns a log line parses
+# into, in log_arrow_schema. Nothing is formatted, the text columns are dictionary encoded
+def log_record_batch(fields):
+    octets = fields['ip_octets'].astype('uint32')
+    day_start = np.datetime64(fields['day_start'], 'ns')
+    columns = [
+        octets[:, 0] << 24 | octets[:, 1] << 16 | octets[:, 2] << 8 | octets[:, 3],
+        day_start + fields['start_seconds'].astype('timedelta64[s]'),
+        day_start + fields['end_seconds'].astype('timedelta64[s]'),
+        pa.array(fields['request'], pa.string()).dictionary_encode(),
+        fields['status_code'].astype('uint16'),
+        fields['response_size'].astype('uint32'),
+        pa.array(fields['user_agent'], pa.string()).dictionary_encode(),
+        pa.array(fields['country_code'], pa.string()).dictionary_encode(),
+        pa.array(fields['traffic_source'], pa.string()).dictionary_encode(),
+    ]
+    return pa.record_batch([pa.array(column) if isinstance(column, np.ndarray) else column for column in columns], schema=log_arrow_schema)
+
+# Shards have a fixed size so the output of a seed does not depend on the number of workers
+SHARD_SIZE = 100000
+
+# Function to split count into shards, each with a seed derived from the run seed
+def shard_plan(count, seed, shard_size=SHARD_SIZE):
+    sizes = [shard_size] * (count // shard_size)
+    if count % shard_size:
+        sizes.append(count % shard_size)
+    return sizes, np.random.SeedSequence(seed).spawn(len(sizes))
+
+# Function to generate a single shard, run in the worker processes
+def generate_shard(start_date, end_date, num_logs, seed_sequence):
+    return generate_raw_logs_vectorized(start_date, end_date, num_logs, np.random.default_rng(seed_sequence))
+
+# Function to generate a single shard as an Arrow record batch, the same logs as generate_shard
+def generate_shard_batch(start_date, end_date, num_logs, seed_sequence):
+    return log_record_batch(generate_log_fields(start_date, end_date, num_logs, np.random.default_rng(seed_sequence)))
+
+# Function to yield the shards of a seeded run in order, spread over a process pool. shard makes each
+# shard, as log lines by default
+def iter_sharded_logs(start_date, end_date, count, seed, workers=None, shard_size=SHARD_SIZE, shard=generate_shard):
+    sizes, seeds = shard_plan(count, seed, shard_size)
+    if workers == 1 or len(sizes) <= 1:
+        for size, seed_sequence in zip(sizes, seeds):
+            yield shard(start_date, end_date, size, seed_sequence)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(shard, repeat(start_date), repeat(end_date), sizes, seeds)
+
+# Function to generate reproducible logs for a given seed, count and date range
+def generate_sharded_logs(start_date, end_date, count, seed, workers=None, shard_size=SHARD_SIZE):
+    return list(chain.from_iterable(iter_sharded_logs(start_date, end_date, count, seed, workers, shard_size)))
+
+# Function to yield newline-delimited logs chunk by chunk, so only one chunk is held in memory
+def stream_raw_logs(start_date, end_date, num_logs, chunk_size=10000, engine='numpy'):
+    remaining = num_logs
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        if engine == 'numpy':
+            raw_logs = generate_raw_logs_vectorized(start_date, end_date, size)
+        else:
+            raw_logs = generate_raw_logs(start_date, end_date, size)
+        yield ''.join(raw_log + '\n' for raw_log in raw_logs).encode('utf-8')
+        remaining -= size
+
+# Function to yield Arrow record batches of logs chunk by chunk, so only one chunk is held in memory
+def stream_log_batches(start_date, end_date, num_logs, chunk_size=10000):
+    remaining = num_logs
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        yield log_record_batch(generate_log_fields(start_date, end_date, size))
+        remaining -= size
+
+# Buffer compressions of the Arrow endpoint, None for none
+arrow_compressions = (None, 'lz4', 'zstd')
+
+# Function to write record batches as an Arrow IPC stream, yielding the bytes of each batch as soon as
+# it is written. compression, 'zstd' or 'lz4', compresses the buffers of every batch
+def arrow_ipc_chunks(batches, compression=None):
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, log_arrow_schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()  # the end of stream marker
+
+# Function to gzip a stream of byte chunks on the fly
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # wbits=31 writes a gzip header and trailer
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@app.before_request
+def start_request_timer():
+    g.started = time.perf_counter()
+
+# Function to count the bytes of a streamed response as they are sent
+def count_sent_bytes(chunks, endpoint):
+    for chunk in chunks:
+        metrics.inc('olympic_http_response_bytes_total', len(chunk), endpoint=endpoint)
+        yield chunk
+
+# Function to count the logs of newline-delimited chunks as they are generated
+def count_generated_logs(chunks, endpoint):
+    for chunk in chunks:
+        metrics.inc('olympic_logs_generated_total', chunk.count(b'\n'), endpoint=endpoint)
+        yield chunk
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    if response.is_streamed:
+        response.response = count_sent_bytes(response.response, endpoint)
+    else:
+        metrics.inc('olympic_http_response_bytes_total', response.content_length or 0, endpoint=endpoint)
+    # Observed once the body is sent, so streamed responses are timed to their last chunk
+    started, method, status = g.started, request.method, str(response.status_code)
+    response.call_on_close(lambda: metrics.observe('olympic_http_request_duration_seconds', time.perf_counter() - started,
+                                                   endpoint=endpoint, method=method, status=status))
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/')
+def index():
+    return "Welcome to the Payris fun Olympic API. To access logs, please visit the '/generate-logs' endpoint, or '/generate-logs/arrow' for Arrow record batches."
+
+@app.route('/generate-logs', methods=['GET'])
+def get_raw_logs():
+    start_date = datetime(2024, 5, 30)
+    end_date = datetime(2024, 8, 30)
+    count = int(request.args.get('count', random.randint(300, 5000)))  # Get the count parameter from the request, default to a random value between 50 and 200
+    engine = request.args.get('engine', 'python')  # 'numpy' draws the whole batch at once
+    seed = request.args.get('seed')
+    if seed is not None:
+        workers = request.args.get('workers')
+        raw_logs = generate_sharded_logs(start_date, end_date, count, int(seed), int(workers) if workers else None)
+    elif engine == 'numpy':
+        raw_logs = generate_raw_logs_vectorized(start_date, end_date, count)
+    else:
+        raw_logs = generate_raw_logs(start_date, end_date, count)
+    metrics.inc('olympic_logs_generated_total', len(raw_logs), endpoint='/generate-logs')
+    response = jsonify(raw_logs)
+    # Compress the batch for clients that accept it, the JSON shrinks roughly tenfold
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.route('/generate-logs/stream', methods=['GET'])
+def stream_logs():
+    start_date = datetime(2024, 5, 30)
+    end_date = datetime(2024, 8, 30)
+    count = int(request.args.get('count', random.randint(300, 5000)))
+    chunk_size = int(request.args.get('chunk_size', 10000))
+    engine = request.args.get('engine', 'numpy')
+    seed = request.args.get('seed')
+    if seed is not None:
+        workers = request.args.get('workers')
+        shards = iter_sharded_logs(start_date, end_date, count, int(seed), int(workers) if workers else None)
+        chunks = (''.join(raw_log + '\n' for raw_log in shard).encode('utf-8') for shard in shards)
+    else:
+        chunks = stream_raw_logs(start_date, end_date, count, chunk_size, engine)
+    chunks = count_generated_logs(chunks, '/generate-logs/stream')
+    if request.args.get('gzip') == '1':
+        return Response(gzip_chunks(chunks), mimetype='text/plain', headers={'Content-Encoding': 'gzip'})
+    return Response(chunks, mimetype='text/plain')
+
+# Function to count the logs of record batches as they are generated
+def count_generated_rows(batches, endpoint):
+    for batch in batches:
+        metrics.inc('olympic_logs_generated_total', batch.num_rows, endpoint=endpoint)
+        yield batch
+
+# The typed columns of the logs as Arrow record batches instead of formatted lines, so neither side
+# formats or parses the text of a line. Same parameters as the stream, compression ('zstd' or 'lz4')
+# compresses the buffers of each batch
+@app.route('/generate-logs/arrow', methods=['GET'])
+def arrow_logs():
+    # Checked before the response starts, the stream cannot report an error once it is under way
+    compression = request.args.get('compression')
+    if compression not in arrow_compressions:
+        return jsonify(error=f"compression must be one of {', '.join(name for name in arrow_compressions if name)}, not {compression!r}"), 400
+    start_date = datetime(2024, 5, 30)
+    end_date = datetime(2024, 8, 30)
+    count = int(request.args.get('count', random.randint(300, 5000)))
+    chunk_size = int(request.args.get('chunk_size', 10000))
+    seed = request.args.get('seed')
+    if seed is not None:
+        workers = request.args.get('workers')
+        batches = iter_sharded_logs(start_date, end_date, count, int(seed), int(workers) if workers else None, shard=generate_shard_batch)
+    else:
+        batches = stream_log_batches(start_date, end_date, count, chunk_size)
+    batches = count_generated_rows(batches, '/generate-logs/arrow')
+    return Response(arrow_ipc_chunks(batches, compression), mimetype='application/vnd.apache.arrow.stream')
+
+# Function to write a seeded run to a file in the web_logs.csv format
+def write_sharded_logs(output, start_date, end_date, count, seed, workers=None):
+    with open(output, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for shard in iter_sharded_logs(start_date, end_date, count, seed, workers):
+            writer.writerows([raw_log] for raw_log in shard)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Payris fun Olympic log generator. Serves the API when run without a command.")
+    commands = parser.add_subparsers(dest='command')
+    generate = commands.add_parser('generate', help="write reproducible logs to a file instead of serving the API")
+    generate.add_argument('--count', type=int, required=True)
+    generate.add_argument('--seed', type=int, required=True)
+    generate.add_argument('--workers', type=int, default=None, help="worker processes, defaults to the number of CPUs")
+    generate.add_argument('--start', type=datetime.fromisoformat, default=datetime(2024, 5, 30))
+    generate.add_argument('--end', type=datetime.fromisoformat, default=datetime(2024, 8, 30))
+    generate.add_argument('--output', default='web_logs.csv')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        write_sharded_logs(args.output, args.start, args.end, args.count, args.seed, args.workers)
+        print(f"Wrote {args.count} logs with seed {args.seed} to {args.output}", file=sys.stderr)
+    else:
+        app.run(debug=True)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,600 +1,840 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import pycountry
-import time
-import calendar
-from datetime import datetime
-import humanize
-import re
-
-
-csv_file= "web_logs.csv"
-
-@st.cache(ttl=60)
-def load_data():
-    # Load data from CSV file
-    return pd.read_csv("web_logs.csv")
-        
-def load_and_clean_data(csv_file):
-    # Load raw data from CSV
-    raw_data = pd.read_csv(csv_file, header=None)
-
-    # Extract information from raw data
-    cleaned_data = raw_data[0].str.extract(r'(\d+\.\d+\.\d+\.\d+) - - \[(.*?)\] - \[(.*?)\]\"(.+?)\" (\d+) (\d+) \"(.+?)\" \"(\w+)\" \"(.+?)\"')
-
-    # Rename the columns
-    cleaned_data.columns = ['IP Address', 'Timestamp Start', 'Timestamp End', 'Request', 'Status Code', 'Response Size', 'User Agent', 'Country Code', 'Traffic Source']
-
-    # Convert timestamps to datetime format
-    cleaned_data['Timestamp Start'] = pd.to_datetime(cleaned_data['Timestamp Start'], format='%d/%b/%Y:%H:%M:%S')
-    cleaned_data['Timestamp End'] = pd.to_datetime(cleaned_data['Timestamp End'], format='%d/%b/%Y:%H:%M:%S')
-
-    return cleaned_data
-
-# Function to download the cleaned data
-def download_cleaned_data(cleaned_data):
-    csv = cleaned_data.to_csv(index=False).encode('utf-8')
-    st.download_button(
-        label="Download CSV",
-        data=csv,
-        file_name='cleaned_data.csv',
-        mime='text/csv',
-    )
-
-# Function for dashboard
-def dashboard_page(cleaned_data):
-    st.title('FUN OLYMPICS DASHBOARD')
-
-    # Create a dropdown menu to select columns
-    selected_columns = st.multiselect("Select columns to display", ["Display all columns"] + cleaned_data.columns.tolist())
-
-    # If no columns are selected, display a warning message
-    if not selected_columns:
-        st.warning("Click to view CSV.")
-
-    # If "Display all columns" option is chosen, display the first 5 records of the entire DataFrame
-    elif "Display all columns" in selected_columns:
-        st.write(cleaned_data.head())
-
-    # If columns are selected, display the first 5 records with selected columns
-    else:
-        st.write(cleaned_data[selected_columns].head())
-    
-    
-    download_cleaned_data(cleaned_data)
-
-    # Date filters
-    st.subheader('Select Date Range')
-    
-    col1, col2 = st.columns(2)
-
-    # Define the range for generating logs
-    generation_start_date = pd.Timestamp(2024, 5, 30)
-    generation_end_date = pd.Timestamp(2024, 8, 30)
-
-    # Set the default value for the date input fields
-    default_start_date = generation_start_date
-    default_end_date = generation_end_date
-
-    with col1:
-        start_date = st.date_input('Start Date', value=default_start_date, min_value=generation_start_date, max_value=generation_end_date)
-    with col2:
-        end_date = st.date_input('End Date', value=default_end_date, min_value=generation_start_date, max_value=generation_end_date)
-
-    if start_date > end_date:
-        st.warning("Start date must be before end date.")
-        return
-
-    # Filter data based on the selected date range
-    filtered_data = cleaned_data[
-        (pd.to_datetime(cleaned_data['Timestamp Start']) >= pd.to_datetime(start_date)) & 
-        (pd.to_datetime(cleaned_data['Timestamp Start']) <= pd.to_datetime(end_date))
-    ]
-
-    # Calculate total visits
-    total_visits = filtered_data.shape[0]
-
-    # Calculate number of live sessions from Olympic Channel
-    live_sessions_olympic_channel = filtered_data['Request'].str.contains('/olympic-channel/live-stream').sum()
-
-    # Total live sessions
-    total_live_sessions = live_sessions_olympic_channel
-
-    # Calculate total page views
-    total_page_views = filtered_data['Request'].nunique()
-    
-    # Calculate average session duration
-    filtered_data['Session Duration'] = (filtered_data['Timestamp End'] - filtered_data['Timestamp Start']).dt.total_seconds()
-    average_session_duration = filtered_data['Session Duration'].mean()
-
-    # Format the numbers for presentation
-    formatted_total_visits = humanize.intcomma(total_visits)
-    formatted_total_page_views = humanize.intcomma(total_page_views)
-    formatted_total_live_streams = humanize.intcomma(total_live_sessions)
-    formatted_average_session_duration = humanize.naturaldelta(average_session_duration)
-
-    # Display metrics using st.metric() function
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        st.metric("Log Entries", formatted_total_visits)
-
-    with col2:
-        st.metric("Page Views", formatted_total_page_views)
-
-    with col3:
-        st.metric("Live Streams", formatted_total_live_streams)
-
-    with col4:
-        st.metric("Avg. Session Duration (m)", formatted_average_session_duration)
-
-    st.subheader("Traffic Analysis")
-
-    analysis_option = st.selectbox("Select analysis option", ["Traffic Per Hour", "Traffic Per Day", "Traffic Per Week", "Traffic Per Month"])
-
-    if analysis_option == "Traffic Per Hour":
-        analyze_traffic_per_hour(filtered_data)
-    elif analysis_option == "Traffic Per Day":
-        analyze_traffic_per_day(filtered_data)
-    elif analysis_option == "Traffic Per Week":
-        analyze_traffic_per_week(filtered_data)
-    elif analysis_option == "Traffic Per Month":
-        analyze_traffic_per_month(filtered_data)
-
-
-    #  Extract relevant information from User Agent strings
-    if 'User Agent' in filtered_data.columns:
-        filtered_data['Browser'] = filtered_data['User Agent'].str.extract(r'(?P<Browser>Chrome|Firefox|Edge|Safari)')
-        filtered_data['Device'] = filtered_data['User Agent'].str.extract(r'(?P<Device>\bAndroid\b|\biPad\b|\biPhone\b|\bWindows\b|\bMacintosh\b|\bLinux\b)')
-
-    # Ensure 'Browser' and 'Device' columns exist
-    if 'Browser' in filtered_data.columns:
-        browser_counts = filtered_data['Browser'].value_counts()
-    else:
-        browser_counts = pd.Series([], name='Browser')
-
-    if 'Device' in filtered_data.columns:
-        device_counts = filtered_data['Device'].value_counts()
-    else:
-        device_counts = pd.Series([], name='Device')
-    
-    #traffic analysis
-    traffic_sources = filtered_data['Traffic Source'].value_counts().reset_index()
-    traffic_sources.columns = ['Traffic Source', 'Count']
-
-    # Assuming cleaned_data contains the relevant column for status codes
-    error_data = filtered_data['Status Code'].value_counts().reset_index()
-    error_data.columns = ['Status Code', 'Count']
-    
-    #Response Size distribution
-    response_size_data = filtered_data['Response Size'].describe().reset_index()
-    response_size_data.columns = ['Metric', 'Value']
-
-    # most requested page 
-    # Extract page path from request URLs
-    filtered_data['page'] = filtered_data['Request'].apply(lambda x: x.split()[1])
-
-    # Most accessed pages
-    most_accessed_pages = filtered_data['page'].value_counts().reset_index()
-    most_accessed_pages.columns = ['Page', 'Count']
-
-    top_n = 10  # Change this number to the desired number of top pages
-    top_pages = most_accessed_pages.head(top_n)
-
-    # Live stream interaction
-    # Extract interactions
-    chats = filtered_data[filtered_data['Request'].str.contains('/olympic-channel/live-stream/.*/chat')]
-    polls = filtered_data[filtered_data['Request'].str.contains('/olympic-channel/live-stream/.*/poll')]
-    share_reactions = filtered_data[filtered_data['Request'].str.contains('/olympic-channel/live-stream/.*/share-reaction')]
-
-    # Count interactions
-    interaction_counts = pd.DataFrame({
-        'Interaction Type': ['Chat', 'Poll', 'Share Reaction'],
-        'Count': [len(chats), len(polls), len(share_reactions)]
-    })
-    
-    # Extract the sports event and interaction type from the 'Request' column
-    filtered_data[['Sports Event', 'Interaction']] = filtered_data['Request'].str.extract(r'/olympic-channel/live-stream/(\w+)/(.*?)\b')
-    
-    # Count the number of interactions for each sports event
-    top_sports = filtered_data.groupby('Sports Event').size().reset_index(name='Interactions').sort_values(by='Interactions', ascending=False)
-    
-    # Filter top 10 sports
-    top_sports = top_sports.head(10)
-
-    # Create two columns for displaying visuals side by side
-    col1, col2 = st.columns(2)
-
-    # Add browser distribution visualization to the first column
-    with col1:
-        st.plotly_chart(px.bar(browser_counts, x=browser_counts.index, y=browser_counts.values, labels={'x': 'Browser', 'y': 'Count'}, title='Browser Distribution', height=350, width=300))
-
-    # Add device distribution visualization to the second column
-    with col2:
-        st.plotly_chart(px.bar(device_counts, x=device_counts.index, y=device_counts.values, labels={'x': 'Device', 'y': 'Count'}, title='Device Distribution', height=350, width=300))
-    
-    col1, col2 = st.columns(2)
-    # Add traffic source analysis visualization (Pie chart) to the first column
-    with col1:
-        st.plotly_chart(px.pie(traffic_sources, names='Traffic Source', values='Count', title='Traffic Sources Distribution', height=400, width= 350))
-
-    # Add error analysis visualization (Bar graph) to the second column
-    with col2:
-        st.plotly_chart(px.pie(error_data,
-        names='Status Code',
-        values='Count',
-        title='Error Analysis', height=400, width= 350))
-    
-    col1, col2 = st.columns(2)   
-    # Distribution of response sizes (Histogram)
-    with col1:
-        st.plotly_chart(px.histogram(filtered_data, x='Response Size', nbins=50, title='Distribution of Response Sizes', height=400, width= 300))
-    
-    with col2:
-        fig = go.Figure(data=[go.Table(
-            header=dict(values=['Page', 'Count'],
-                        fill_color='light blue',
-                        align='left'),
-            cells=dict(values=[top_pages.Page, top_pages.Count],
-                        fill_color='light gray',
-                        align='left'))
-        ])
-        fig.update_layout(
-            title='Top Accessed Pages',  
-            height=400,  # Adjust height to fit within the column
-            margin=dict(l=0, r=0, b=0, t=100)  # Adjust margins as needed
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    # Create two columns for displaying visuals side by side
-    col1, col2 = st.columns(2)
-
-    # Add Donut Chart to the first column
-    with col1:
-        fig_donut_chart = px.pie(interaction_counts, 
-                             values='Count', 
-                             names='Interaction Type', 
-                             title='Viewership Interactions',
-                             hole=0.4)
-        fig_donut_chart.update_layout(width=300, height=350)
-        st.plotly_chart(fig_donut_chart)
-
-    with col2:
-        # Create a vertical bar chart for the top sports
-        fig_top_sports = px.bar(top_sports, 
-                                x='Sports Event', 
-                                y='Interactions', 
-                                title='Top 10 Viewed Sports Based on Interactions', 
-                                labels={'Sports Event': 'Sport', 'Interactions': 'Interaction Count'},
-                                color='Interactions')
-        fig_top_sports.update_layout(width=400, height=400)
-        # Display the bar chart in Streamlit
-        st.plotly_chart(fig_top_sports)
-
-    st.subheader("Number Of Visit Analysis")
-    # Create a multi-select menu for country analysis columns
-    country_analysis_columns = st.multiselect("Select columns for analysis", ["Country Code", "Timestamp Start"])
-
-    # Show the appropriate visualization based on the selected columns
-    country_names = {c.alpha_2: c.name for c in pycountry.countries}
-    if "Country Code" in country_analysis_columns and "Timestamp Start" in country_analysis_columns:
-        # Compare time of visit with number of visits by country
-        filtered_data['hour'] = pd.to_datetime(filtered_data['Timestamp Start']).dt.hour
-        time_country_visits = filtered_data.groupby(['Country Code', 'hour']).size().reset_index(name='Number of Visits')
-        time_country_visits['Country Name'] = time_country_visits['Country Code'].map(country_names)
-        fig = px.line(time_country_visits, x='hour', y='Number of Visits', color='Country Name', title='Number of Visits by Time and Country', height=600, width=600)
-        fig.update_layout(
-            xaxis=dict(
-                tickmode='array',
-                tickvals=list(range(24)),
-                ticktext=[f'{hour:02}:00' for hour in range(24)]
-            )
-        )
-        st.plotly_chart(fig)
-
-    elif "Country Code" in country_analysis_columns:
-        # Number of visits by country visualization
-        visits_by_country = filtered_data['Country Code'].value_counts().reset_index()
-        visits_by_country.columns = ['Country Code', 'Number of Visits']
-        st.plotly_chart(px.bar(visits_by_country, x='Country Code', y='Number of Visits', title='Number of Visits by Country'))
-    
-
-# Function to analyze traffic per hour
-def analyze_traffic_per_hour(df):
-    # Assuming df contains Timestamp Start column
-    df['hour'] = pd.to_datetime(df['Timestamp Start']).dt.hour
-
-    # Grouping data by hour and counting the number of requests
-    traffic_per_hour = df.groupby('hour').size().reset_index(name='count')
-
-    # Plotting traffic per hour
-    fig = px.line(traffic_per_hour, x='hour', y='count', title='Traffic Per Hour')
-    
-    # Customize x-axis labels to display actual hours
-    fig.update_layout(
-        xaxis=dict(
-            title='Hour of the Day',
-            tickmode='array',
-            tickvals=list(range(24)),  # Hourly values from 0 to 23
-            ticktext=[f'{hour:02}:00' for hour in range(24)]  # Format labels as 'hour:00'
-        ),
-        yaxis=dict(title='Traffic Count')
-    )
-
-    st.plotly_chart(fig)
-
-def analyze_traffic_per_day(df):
-    # Assuming df contains Timestamp Start column
-    df['day'] = pd.to_datetime(df['Timestamp Start']).dt.date
-
-    # Grouping data by day and counting the number of requests
-    traffic_per_day = df.groupby('day').size().reset_index(name='count')
-
-    # Plotting traffic per day
-    fig = px.line(traffic_per_day, x='day', y='count', title='Traffic Per Day')
-
-    # Customize x-axis labels
-    fig.update_layout(
-        xaxis=dict(title='Day'),
-        yaxis=dict(title='Traffic Count')
-    )
-
-    st.plotly_chart(fig)
-
-# Function to analyze traffic per week
-def analyze_traffic_per_week(df):
-    # Assuming df contains timestamp_start column
-    df['week'] = pd.to_datetime(df['Timestamp Start']).dt.isocalendar().week
-
-    # Grouping data by week and counting the number of requests
-    traffic_per_week = df.groupby('week').size().reset_index(name='count')
-
-    # Plotting traffic per week
-    fig = px.bar(traffic_per_week, x='week', y='count', title='Traffic Per Week')
-    st.plotly_chart(fig)
-
-# Function to analyze traffic per month
-def analyze_traffic_per_month(df):
-    # Assuming df contains Timestamp Start column
-    df['month'] = pd.to_datetime(df['Timestamp Start']).dt.month
-
-    # Grouping data by month and counting the number of requests
-    traffic_per_month = df.groupby('month').size().reset_index(name='count')
-    
-    # Get month names
-    traffic_per_month['month'] = traffic_per_month['month'].apply(lambda x: calendar.month_name[x])
-
-    # Plotting traffic per month
-    fig = px.bar(traffic_per_month, x='month', y='count', title='Traffic Per Month')
-    st.plotly_chart(fig)
-
-# Function for Exploratory Data Analysis
-def perform_eda(df):
-
-    # Interactive widgets for exploratory data analysis
-    st.title("Exploratory Data Analysis")
-
-    # Display basic statistics
-    st.subheader("OLYMPICS BASIC STATISTICS ")
-    st.write(df.describe())
-
-    # Country of Origin Analysis
-    country_names = {c.alpha_2: c.name for c in pycountry.countries}
-    st.subheader("COUNTRY OF ORIGIN ANALYSIS")
-    country_visits = df['Country Code'].value_counts().rename(index=country_names)
-    st.write(country_visits)
-
-    # Total number of visits from all countries
-    total_visits = country_visits.sum()
-    
-    # Display the total number of visits
-    st.write("Total Visits:", total_visits)
-    
-    # Top countries with the highest number of visits
-    top_countries = country_visits.head(5)  # Change 5 to the desired number of top countries
-    st.write("Top 5 Countries with the Highest Number of Visits:")
-    st.write(top_countries)
-
-    #Time Visit Analysis
-    st.subheader("TIME OF VISIT ANALYSIS")
-    # Extract hour and day from the timestamp
-    df['Hour'] = df['Timestamp Start'].dt.hour
-    df['Date'] = df['Timestamp Start'].dt.date
-    df['week'] = df['Timestamp Start'].dt.isocalendar().week
-    df['month']= df['Timestamp Start'].dt.month
-    # Group visits by hour
-    visits_by_hour = df.groupby(df['Timestamp Start'].dt.strftime('%H:00')).size()
-    
-    # Display the results
-    st.write("Visits by Hour:")
-    st.write(visits_by_hour)
-
-    # Find the hour with the highest number of visits
-    peak_hour = visits_by_hour.idxmax()
-
-    # Get the number of visits during the peak hour
-    peak_hour_visits = visits_by_hour.max()
-
-    # Display the peak hour and the number of visits during that hour
-    st.write(f"The peak period is at {peak_hour} with {peak_hour_visits} visits.")
-    
-    # Group visits by day
-    visits_by_day = df.groupby('Date').size()
-     
-    st.write("\nVisits by Day:")
-    st.write(visits_by_day)
-
-    # Find the day with the highest number of visits
-    peak_day = visits_by_day.idxmax()
-    peak_day_visits = visits_by_day.max()
-
-    st.write(f"The peak day is: {peak_day} with {peak_day_visits} visits.")
-
-    # Group visits by week
-    visits_by_week = df.groupby('week').size()
-    st.write("\nVisits by week:")
-    st.write(visits_by_week)
-
-    # Find the week with the highest number of visits
-    peak_week = visits_by_week.idxmax()
-    peak_week_visits = visits_by_week.max()
-
-    st.write(f"The peak week is: week {peak_week} with {peak_week_visits} visits.")
-
-    # Group visits by month
-    visits_by_month = df.groupby('month').size()
-    #traffic_per_month = df.groupby('month').size().reset_index(name='count')
-    st.write("\nVisits by month:")
-    st.write(visits_by_month)
-
-    # Find the month with the highest number of visits
-    peak_month_number = int(visits_by_month.idxmax())
-    peak_month_visits = visits_by_month.max()
-    # Convert month number to month name
-    peak_month_name = calendar.month_name[peak_month_number]
-
-    st.write(f"The peak month is in {peak_month_name} with {peak_month_visits} visits.")
-    
-    
-    # Number of Visits Analysis
-    st.subheader("NUMBER OF VISITS ANALYSIS")
-    
-    # Basic summary statistics
-    st.subheader("Basic Statistics")
-    st.write("Average number of visits per day:")
-    st.write(df.groupby(df['Timestamp Start'].dt.date).size().mean())
-    st.write("Maximum number of visits in a single day:")
-    st.write(df.groupby(df['Timestamp Start'].dt.date).size().max())
-    st.write("Minimum number of visits in a single day:")
-    st.write(df.groupby(df['Timestamp Start'].dt.date).size().min())
-   
-
-    # Number of Visits to Each Page
-    st.subheader("Number of Visits to Each Page")
-    page_visits = df['Request'].apply(lambda x: x.split()[1]).value_counts()
-    st.write("Number of Visits to Each Page:")
-    st.write(page_visits)
-
-    # Display popular pages
-    st.subheader("Popular Pages")
-    popular_pages = page_visits.head(5)  # Display the top 5 most visited pages
-    st.write(popular_pages)
-
-    # Traffic source Analysis
-    st.subheader("TRAFFIC SOURCE ANALYSIS")
-    
-    # Basic Statistics for Traffic Sources
-    st.subheader("Basic Statistics for Traffic Sources")
-    traffic_source_counts = df['Traffic Source'].value_counts()
-    st.write("Number of Visits by Traffic Source:")
-    st.write(traffic_source_counts)
-    st.write("Total Number of Unique Traffic Sources:", len(traffic_source_counts))
-    st.write("Most Common Traffic Source:", traffic_source_counts.idxmax())
-    
-    # Traffic source Analysis
-    st.subheader(" ERROR ANALYSIS")
-    
-    # Distribution of status codes
-    st.subheader("Basic Statistics for Status Codes")
-    
-    # Basic Statistics for Status Codes
-    status_code_counts = df['Status Code'].value_counts()
-    st.write("Number of Occurrences by Status Code:")
-    st.write(status_code_counts)
-    st.write("Total Number of Unique Status Codes:", len(status_code_counts))
-    st.write("Most Common Status Code:", status_code_counts.idxmax())
-
-    # MAIN INTERESTS ANALYSIS
-
-    st.subheader("Main Interests (Based on Selected/Viewed Sports)")
-
-    # Top sports
-    st.write("Favourites Analysis:")
-    st.write("Top Favourite Sports")
-    top_sports_events = df[df['Request'].str.contains('/sports/')]['Request'].value_counts().head(5)
-    st.write(top_sports_events)
-
-
-    st.subheader("Top Sports Selected/Viewed")
-    
-    # Extract the sports event and interaction type from the 'Request' column
-    df[['Sports Event', 'Interaction']] = df['Request'].str.extract(r'/olympic-channel/live-stream/(\w+)/(.*?)\b')
-
-    # Count the number of interactions for each sports event
-    top_sports = df.groupby('Sports Event').size().reset_index(name='Interactions').sort_values(by='Interactions', ascending=False)
-    
-    # Display the top viewed or selected sports
-    st.write("Top Viewed/Selected Sports:")
-    st.write(top_sports)
-
-    live_streams = df[df['Request'].str.contains('/olympic-channel/live-stream')]
-    chats = df[df['Request'].str.contains('/olympic-channel/live-stream/.*/chat')]
-    polls = df[df['Request'].str.contains('/olympic-channel/live-stream/.*/poll')]
-    share_reactions = df[df['Request'].str.contains('/olympic-channel/live-stream/.*/share-reaction')]
-
-    # Count the number of live stream sessions, chats, polls, and share reactions
-    num_live_streams = len(live_streams)
-    num_chats = len(chats)
-    num_polls = len(polls)
-    num_share_reactions = len(share_reactions)
-
-    # Display the results
-    st.subheader("Viewership Analysis")
-    st.write("Number of Live Stream Sessions:", num_live_streams)
-    st.write("Number of Chats:", num_chats)
-    st.write("Number of Polls:", num_polls)
-    st.write("Number of Share Reactions:", num_share_reactions)
-
-    # Extract the sports being streamed from the request URLs
-    live_streams['Sport'] = live_streams['Request'].str.extract(r'/olympic-channel/live-stream/(\w+)')
-
-    # Calculate the duration of each live stream session
-    live_streams['Timestamp Start'] = pd.to_datetime(live_streams['Timestamp Start'])
-    live_streams['Timestamp End'] = pd.to_datetime(live_streams['Timestamp End'])
-    live_streams['Duration'] = (live_streams['Timestamp End'] - live_streams['Timestamp Start']).dt.total_seconds()
-
-    # Calculate the average duration of live stream sessions for each sport
-    average_durations = live_streams.groupby('Sport')['Duration'].mean()
-
-    # Display the average duration of live stream sessions for each sport
-    st.subheader("Average Duration of Live Stream Sessions by Sport")
-    st.write(average_durations)  
-
-
-    #Analysing user agents
-    st.subheader("USER AGENT ANALYSIS")
-
-    # Extract relevant information from User Agent strings
-    df['Browser'] = df['User Agent'].str.extract(r'(?P<Browser>Chrome|Firefox|Edge|Safari)')
-    df['Device'] = df['User Agent'].str.extract(r'(?P<Device>\bAndroid\b|\biPad\b|\biPhone\b|\bWindows\b|\bMacintosh\b|\bLinux\b)')
-
-    # Count occurrences of each unique combination
-    browser_counts = df['Browser'].value_counts()
-    device_counts = df['Device'].value_counts()
-
-    # Display the counts as dataframes
-    st.write("Browser Distribution")
-    st.dataframe(browser_counts)
-
-    st.write("Device Distribution")
-    st.dataframe(device_counts)
-
-# Main function
-def main():
-    st.sidebar.image("paris2024.png", caption="PAYRIS FUN OLYMPICS" )
-    selected_page = st.sidebar.radio("Navigation", ["Dashboard", "Exploratory Data Analysis"])
-
-    if selected_page == "Dashboard":
-        cleaned_data = load_and_clean_data("web_logs.csv")
-        dashboard_page(cleaned_data)
-    elif selected_page == "Exploratory Data Analysis":
-        df = load_and_clean_data("web_logs.csv")
-        perform_eda(df)
-
-if __name__ == "__main__":
-    while True:
-        main()
-        time.sleep(60)  # Sleep for 60 seconds before rerunning
-        st.rerun()
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import pycountry
+import calendar
+from datetime import datetime
+import humanize
+import re
+import os
+import time
+import threading
+import gzip
+import tempfile
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.parquet as pq
+from chart_data import downsample
+from instrumentation import collect_timings, timed
+from log_aggregates import AggregateLogCache
+from log_parsing import derived_columns, for_display, log_columns, sort_by_time
+from log_queries import describe, distinct_count, group_sizes, histogram, log_chunks, mean_by, row_count, slice_logs, value_counts
+from log_rollup import RollupLogCache, build_rollup, filter_rollup, read_rollup, rollup_counts, rollup_time_counts, rollup_totals
+from log_sketches import SpaceSaving, read_sketches
+from log_sqlite import SqliteLogView, is_sqlite_store, sqlite_version
+from log_store import log_segments, read_parquet_store, store_version
+
+
+csv_file= "web_logs.csv"
+# Set OLYMPIC_DATA_SOURCE to the Parquet store directory or the SQLite store (a .db file) written by fetch_data to read from it instead
+data_source = os.environ.get("OLYMPIC_DATA_SOURCE", csv_file)
+# Hourly counts kept by fetch_data next to the Parquet store
+rollup_store = os.environ.get("OLYMPIC_ROLLUP_STORE", "web_logs_rollup")
+# Daily sketches kept by fetch_data, which answer the approximate mode of the dashboard
+sketch_store = os.environ.get("OLYMPIC_SKETCH_STORE", "web_logs_sketches")
+# Set OLYMPIC_CHUNK_BYTES to read a CSV data source larger than memory that many bytes at a time, keeping
+# running aggregates of the logs instead of the logs themselves
+chunk_bytes = int(os.environ.get("OLYMPIC_CHUNK_BYTES", 0))
+# Processes parsing a large CSV data source, all the CPUs by default; 1 parses it in the app's process
+parse_workers = int(os.environ["OLYMPIC_PARSE_WORKERS"]) if os.environ.get("OLYMPIC_PARSE_WORKERS") else None
+
+# How often to look for new logs, in seconds
+refresh_seconds = 60
+
+# Define the range for generating logs
+generation_start_date = pd.Timestamp(2024, 5, 30)
+generation_end_date = pd.Timestamp(2024, 8, 30)
+
+# Parse cache kept across reruns and sessions, so each rerun only parses newly appended logs
+# and only adds their counts to the rollup
+@st.cache_resource(show_spinner=False)
+def log_cache():
+    return RollupLogCache(parse_workers)
+
+# Running aggregates kept across reruns and sessions, so each rerun only reads newly appended logs
+@st.cache_resource(show_spinner=False)
+def aggregate_cache():
+    return AggregateLogCache(chunk_bytes)
+
+def load_and_clean_data(csv_file, start_date=None, end_date=None, columns=None):
+    # A SQLite store is not loaded: every question about its logs is answered by a query
+    if is_sqlite_store(csv_file):
+        return SqliteLogView(csv_file, columns=columns)
+
+    # A directory is the day-partitioned Parquet store: only the days in range and the requested columns are read
+    if os.path.isdir(csv_file):
+        with timed('read'):
+            return sort_by_time(read_parquet_store(csv_file, start_date, end_date, columns))
+
+    # Read in chunks, only the aggregates of the logs are kept
+    if chunk_bytes:
+        aggregates = aggregate_cache().load(csv_file)
+        if aggregates.malformed_count:
+            st.warning(f"Skipped {humanize.intcomma(aggregates.malformed_count)} malformed log lines, e.g. {aggregates.malformed_example!r}")
+        return aggregates if columns is None else aggregates[columns]
+
+    # Load raw data from CSV, including segments rotated out by fetch_data, parsing only the part not seen before
+    cleaned_data = log_cache().load(csv_file)
+    malformed = log_cache().malformed_lines()
+    if len(malformed):
+        st.warning(f"Skipped {humanize.intcomma(len(malformed))} malformed log lines, e.g. {malformed.iloc[0]!r}")
+
+    # Every log is already parsed and cached: the columns are only picked out of the cached frame, not
+    # copied, so leaving some out saves nothing but copying them would cost a copy on every rerun
+    return cleaned_data if columns is None else select_columns(cleaned_data, columns)
+
+# Function to select columns of a frame without copying them, the selection shares the frame's arrays
+def select_columns(cleaned_data, columns):
+    return pd.DataFrame({column: cleaned_data[column] for column in columns}, copy=False)
+
+# Function to load the hourly rollup of the logs loaded by load_and_clean_data
+def load_rollup(csv_file, start_date=None, end_date=None):
+    # The logs of a SQLite store answer what the rollup would, with GROUP BY queries
+    if is_sqlite_store(csv_file):
+        return SqliteLogView(csv_file, start_date, end_date)
+    if os.path.isdir(csv_file):
+        with timed('rollup'):
+            if os.path.isdir(rollup_store):
+                return read_rollup(rollup_store, start_date, end_date)
+            # No rollup kept for this store, count the rows instead
+            return build_rollup(read_parquet_store(csv_file, start_date, end_date))
+    if chunk_bytes:
+        return aggregate_cache().rollup()
+    return log_cache().rollup()
+
+# Function to merge the daily sketches of the days from start_date to end_date
+def load_sketches(start_date, end_date):
+    with timed('sketches'):
+        return read_sketches(sketch_store, start_date, end_date)
+
+# Function to format an estimate with its error bound, like "≈8,748 ±288"
+def format_estimate(estimate, bound):
+    return f"≈{humanize.intcomma(round(estimate))} ±{humanize.intcomma(round(bound))}"
+
+# Function to return a value that changes whenever the logs loaded from csv_file change
+def data_version(csv_file):
+    if is_sqlite_store(csv_file):
+        return sqlite_version(csv_file)
+    if os.path.isdir(csv_file):
+        return store_version(csv_file), store_version(rollup_store)
+    if chunk_bytes:
+        return aggregate_cache().version
+    return log_cache().version
+
+# Function to return the size and modification time of every log file, which tells whether new logs
+# arrived without reading them
+def data_signature(csv_file):
+    if is_sqlite_store(csv_file):
+        return sqlite_version(csv_file)
+    if os.path.isdir(csv_file):
+        return store_version(csv_file), store_version(rollup_store)
+    signature = []
+    for path in log_segments(csv_file):
+        stat = os.stat(path)
+        signature.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+# Fragment rerun every refresh_seconds on its own. It only looks at the log files, and reruns the app when
+# they changed since the last run; the figure cache then only rebuilds the panels of the new data
+@st.experimental_fragment(run_every=refresh_seconds)
+def watch_for_new_logs():
+    signature = data_signature(data_source)
+    if st.session_state.get('data_signature', signature) != signature:
+        st.rerun()
+
+# Least recently used cache of built figures and metrics, holding at most maxsize of them
+class FigureCache:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Function to return the cached value of a key, building and caching it when missing
+    def get(self, key, build):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        value = build()
+        with self.lock:
+            self.entries[key] = value
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+# Figure cache shared across reruns and sessions
+@st.cache_resource(show_spinner=False)
+def figure_cache():
+    return FigureCache()
+
+# Download formats: file extension and mime type
+export_formats = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+# Function to write logs to a temporary file on disk in one of export_formats, chunk_size rows at a time
+# so only one chunk is ever held as text
+def export_data(data, export_format, chunk_size=100000):
+    output = tempfile.TemporaryFile()
+    chunks = (for_display(chunk) for chunk in log_chunks(data, chunk_size))
+    if export_format == 'Parquet':
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = writer or pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+        # No chunk at all leaves no schema to write a file with, the download is then empty
+        if writer is not None:
+            writer.close()
+    else:
+        stream = gzip.GzipFile(fileobj=output, mode='wb') if export_format == 'CSV (gzip)' else output
+        for number, chunk in enumerate(chunks):
+            stream.write(chunk.to_csv(index=False, header=number == 0).encode('utf-8'))
+        if stream is not output:
+            stream.close()
+    output.seek(0)
+    return output
+
+# Function to download the cleaned data. Nothing is written until the download is asked for; the file
+# then holds the logs of the selected date range and the selected columns, every log column by default.
+# The logs are loaded again with those columns, the dashboard leaves out IP addresses it does not show
+def download_cleaned_data(selected_columns):
+    export_format = st.selectbox("Download format", list(export_formats), key='export_format')
+    if not st.button("Prepare download"):
+        return
+
+    start_date = st.session_state.get('start_date', generation_start_date)
+    end_date = st.session_state.get('end_date', generation_end_date)
+    columns = [column for column in selected_columns if column in log_columns] or log_columns
+    cleaned_data = load_and_clean_data(data_source, start_date, end_date, columns)
+    extension, mime = export_formats[export_format]
+    # The button is handed a reader of the file rather than its bytes: Streamlit copies it into its media
+    # store once, the export is not read into memory a second time here
+    with export_data(slice_logs(cleaned_data, start_date, end_date)[columns], export_format) as output:
+        with open(output.fileno(), 'rb', closefd=False) as reader:
+            st.download_button(
+                label=f"Download {export_format}",
+                data=reader,
+                file_name=f'cleaned_data.{extension}',
+                mime=mime,
+            )
+
+# Function for dashboard. In approximate mode unique counts, top values and quantiles come from the daily sketches
+def dashboard_page(cleaned_data, rollup, approximate=False):
+    st.title('FUN OLYMPICS DASHBOARD')
+
+    # Create a dropdown menu to select columns
+    selected_columns = st.multiselect("Select columns to display", ["Display all columns"] + log_columns, key='selected_columns')
+
+    # If no columns are selected, display a warning message
+    if not selected_columns:
+        st.warning("Click to view CSV.")
+
+    # If "Display all columns" option is chosen, display the first 5 records of the entire DataFrame
+    elif "Display all columns" in selected_columns:
+        st.write(for_display(cleaned_data.head()))
+
+    # If columns are selected, display the first 5 records with selected columns
+    else:
+        st.write(for_display(cleaned_data[selected_columns].head()))
+    
+    
+    download_cleaned_data(selected_columns)
+
+    # Date filters
+    st.subheader('Select Date Range')
+    
+    col1, col2 = st.columns(2)
+
+    # Set the default value for the date input fields
+    default_start_date = generation_start_date
+    default_end_date = generation_end_date
+
+    with col1:
+        start_date = st.date_input('Start Date', value=default_start_date, min_value=generation_start_date, max_value=generation_end_date, key='start_date')
+    with col2:
+        end_date = st.date_input('End Date', value=default_end_date, min_value=generation_start_date, max_value=generation_end_date, key='end_date')
+
+    if start_date > end_date:
+        st.warning("Start date must be before end date.")
+        return
+
+    # Filter data based on the selected date range, end date included. The data is sorted by Timestamp Start,
+    # so the range is a slice found by binary search
+    with timed('filter'):
+        filtered_data = slice_logs(cleaned_data, start_date, end_date)
+        filtered_rollup = filter_rollup(rollup, start_date, end_date)
+
+    # Figures and metrics are cached by data version, date range and the widgets of each panel,
+    # so a rerun only rebuilds the panels whose inputs changed
+    panel_key = (data_version(data_source), start_date, end_date)
+    sketches = None
+    if approximate:
+        panel_key += (store_version(sketch_store),)
+        sketches = figure_cache().get(('sketches',) + panel_key, lambda: load_sketches(start_date, end_date))
+    def cached(panel, build, *inputs):
+        def timed_build():
+            with timed(f'build {panel}'):
+                return build()
+        return figure_cache().get((panel,) + panel_key + inputs, timed_build)
+
+    # Display metrics using st.metric() function
+    formatted_total_visits, formatted_total_page_views, formatted_total_live_streams, formatted_average_session_duration = cached('metrics', lambda: dashboard_metrics(filtered_data, filtered_rollup, sketches))
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("Log Entries", formatted_total_visits)
+
+    with col2:
+        st.metric("Page Views", formatted_total_page_views)
+
+    with col3:
+        st.metric("Live Streams", formatted_total_live_streams)
+
+    with col4:
+        st.metric("Avg. Session Duration (m)", formatted_average_session_duration)
+
+    if sketches is not None:
+        visitors = sketches['unique visitors']
+        st.metric("Unique Visitors", format_estimate(visitors.estimate(), visitors.error_bound()))
+        st.caption("≈ values are estimated from daily sketches. Unique counts are HyperLogLog estimates, within ± two standard errors about 95% of the time; "
+                   "top counts are Space-Saving counts, at most their overcount above the true count; quantiles are t-digest estimates, "
+                   "within their rank error of the true quantile.")
+        st.dataframe(cached('quantiles', lambda: quantile_table(sketches)))
+
+    st.subheader("Traffic Analysis")
+
+    analysis_option = st.selectbox("Select analysis option", list(traffic_analyses))
+    st.plotly_chart(cached('traffic', lambda: traffic_analyses[analysis_option](filtered_rollup), analysis_option))
+
+    # Create two columns for displaying visuals side by side
+    col1, col2 = st.columns(2)
+
+    # Add browser distribution visualization to the first column
+    with col1:
+        st.plotly_chart(cached('browser', lambda: count_chart(filtered_data, 'Browser')))
+
+    # Add device distribution visualization to the second column
+    with col2:
+        st.plotly_chart(cached('device', lambda: count_chart(filtered_data, 'Device')))
+    
+    col1, col2 = st.columns(2)
+    # Add traffic source analysis visualization (Pie chart) to the first column
+    with col1:
+        st.plotly_chart(cached('traffic sources', lambda: traffic_sources_chart(filtered_rollup)))
+
+    # Add error analysis visualization (Bar graph) to the second column
+    with col2:
+        st.plotly_chart(cached('errors', lambda: error_chart(filtered_rollup)))
+    
+    col1, col2 = st.columns(2)   
+    # Distribution of response sizes (Histogram)
+    with col1:
+        st.plotly_chart(cached('response sizes', lambda: response_size_chart(filtered_data, sketches)))
+    
+    with col2:
+        st.plotly_chart(cached('top pages', lambda: top_pages_chart(filtered_rollup, sketches)), use_container_width=True)
+
+    # Create two columns for displaying visuals side by side
+    col1, col2 = st.columns(2)
+
+    # Add Donut Chart to the first column
+    with col1:
+        st.plotly_chart(cached('interactions', lambda: interactions_chart(filtered_data)))
+
+    with col2:
+        # Display the bar chart in Streamlit
+        st.plotly_chart(cached('top sports', lambda: top_sports_chart(filtered_data, sketches)))
+
+    st.subheader("Number Of Visit Analysis")
+    # Create a multi-select menu for country analysis columns
+    country_analysis_columns = st.multiselect("Select columns for analysis", ["Country Code", "Timestamp Start"])
+
+    # Show the appropriate visualization based on the selected columns
+    if "Country Code" in country_analysis_columns:
+        by_hour = "Timestamp Start" in country_analysis_columns
+        st.plotly_chart(cached('countries', lambda: country_chart(filtered_rollup, by_hour, sketches), by_hour))
+
+# Function to compute the formatted metrics shown at the top of the dashboard
+def dashboard_metrics(filtered_data, filtered_rollup, sketches=None):
+    # Calculate total visits and the total of their session durations
+    total_visits, total_session_duration = rollup_totals(filtered_rollup)
+
+    # Calculate number of live sessions from Olympic Channel
+    live_sessions_olympic_channel = row_count(filtered_data, ('Section', 'live-stream'))
+
+    # Total live sessions
+    total_live_sessions = live_sessions_olympic_channel
+
+    # Calculate total page views, estimated from the sketches in approximate mode
+    if sketches is None:
+        total_page_views = distinct_count(filtered_data, 'Request')
+    
+    # Calculate average session duration
+    average_session_duration = total_session_duration / total_visits if total_visits else float('nan')
+
+    # Format the numbers for presentation
+    formatted_total_visits = humanize.intcomma(total_visits)
+    if sketches is None:
+        formatted_total_page_views = humanize.intcomma(total_page_views)
+    else:
+        formatted_total_page_views = format_estimate(sketches['unique requests'].estimate(), sketches['unique requests'].error_bound())
+    formatted_total_live_streams = humanize.intcomma(total_live_sessions)
+    formatted_average_session_duration = humanize.naturaldelta(average_session_duration)
+    return formatted_total_visits, formatted_total_page_views, formatted_total_live_streams, formatted_average_session_duration
+
+# Function to plot the distribution of the Browser or Device column
+def count_chart(filtered_data, column):
+    # Ensure the column exists
+    counts = value_counts(filtered_data, column) if column in filtered_data.columns else pd.Series([], name=column)
+    return px.bar(counts, x=counts.index, y=counts.values, labels={'x': column, 'y': 'Count'}, title=f'{column} Distribution', height=350, width=300)
+
+# Function to plot the traffic sources
+def traffic_sources_chart(filtered_rollup):
+    #traffic analysis
+    traffic_sources = rollup_counts(filtered_rollup, 'Traffic Source').reset_index()
+    traffic_sources.columns = ['Traffic Source', 'Count']
+    return px.pie(traffic_sources, names='Traffic Source', values='Count', title='Traffic Sources Distribution', height=400, width= 350)
+
+# Function to plot the status codes
+def error_chart(filtered_rollup):
+    error_data = rollup_counts(filtered_rollup, 'Status Code').reset_index()
+    error_data.columns = ['Status Code', 'Count']
+    return px.pie(error_data,
+        names='Status Code',
+        values='Count',
+        title='Error Analysis', height=400, width= 350)
+
+# Function to plot the distribution of response sizes from 50 bins counted here, not from every row.
+# In approximate mode the bins are estimated from the t-digest of the response sizes
+def response_size_chart(filtered_data, sketches=None):
+    bins = histogram(filtered_data, 'Response Size', nbins=50) if sketches is None else sketches['response size'].histogram(nbins=50)
+    fig = px.bar(bins, x='center', y='count', hover_data=['left', 'right'], labels={'center': 'Response Size'}, title='Distribution of Response Sizes', height=400, width= 300)
+    fig.update_layout(bargap=0)
+    return fig
+
+# Function to show the most accessed pages as a table, with the overcount of each page in approximate mode
+def top_pages_chart(filtered_rollup, sketches=None):
+    top_n = 10  # Change this number to the desired number of top pages
+
+    # Most accessed pages
+    if sketches is None:
+        most_accessed_pages = rollup_counts(filtered_rollup, 'page').reset_index()
+        most_accessed_pages.columns = ['Page', 'Count']
+    else:
+        most_accessed_pages = sketches['top pages'].top(top_n).rename_axis('Page').reset_index()
+        most_accessed_pages.columns = ['Page', 'Count', 'Overcount']
+
+    top_pages = most_accessed_pages.head(top_n)
+
+    fig = go.Figure(data=[go.Table(
+        header=dict(values=list(top_pages.columns),
+                    fill_color='light blue',
+                    align='left'),
+        cells=dict(values=[top_pages[column] for column in top_pages.columns],
+                    fill_color='light gray',
+                    align='left'))
+    ])
+    fig.update_layout(
+        title='Top Accessed Pages',  
+        height=400,  # Adjust height to fit within the column
+        margin=dict(l=0, r=0, b=0, t=100)  # Adjust margins as needed
+    )
+    return fig
+
+# Function to plot the live stream interactions as a donut chart
+def interactions_chart(filtered_data):
+    # Count interactions
+    interactions = value_counts(filtered_data, 'Interaction')
+    interaction_counts = pd.DataFrame({
+        'Interaction Type': ['Chat', 'Poll', 'Share Reaction'],
+        'Count': [interactions.get('chat', 0), interactions.get('poll', 0), interactions.get('share-reaction', 0)]
+    })
+    fig_donut_chart = px.pie(interaction_counts, 
+                         values='Count', 
+                         names='Interaction Type', 
+                         title='Viewership Interactions',
+                         hole=0.4)
+    fig_donut_chart.update_layout(width=300, height=350)
+    return fig_donut_chart
+
+# Function to plot the 10 sports with the most live stream interactions. In approximate mode the error bars
+# reach down to the least each sport can have been counted
+def top_sports_chart(filtered_data, sketches=None):
+    if sketches is None:
+        # Count the number of interactions for each sports event
+        top_sports = group_sizes(filtered_data, 'Sports Event').reset_index(name='Interactions').sort_values(by='Interactions', ascending=False)
+    else:
+        top_sports = sketches['top sports'].top(10).rename_axis('Sports Event').reset_index()
+        top_sports.columns = ['Sports Event', 'Interactions', 'Overcount']
+
+    # Filter top 10 sports
+    top_sports = top_sports.head(10)
+
+    # Create a vertical bar chart for the top sports
+    fig_top_sports = px.bar(top_sports, 
+                            x='Sports Event', 
+                            y='Interactions', 
+                            title='Top 10 Viewed Sports Based on Interactions', 
+                            labels={'Sports Event': 'Sport', 'Interactions': 'Interaction Count'},
+                            color='Interactions',
+                            **overcount_bars(top_sports))
+    fig_top_sports.update_layout(width=400, height=400)
+    return fig_top_sports
+
+# Function to return the error bars of counts with an Overcount column, from each count down to its least true count
+def overcount_bars(counts):
+    if 'Overcount' not in counts.columns:
+        return {}
+    return {'error_y': [0] * len(counts), 'error_y_minus': 'Overcount'}
+
+# Function to plot the number of visits by country, or by country and hour of the day. In approximate mode
+# the countries come from their sketch, with error bars
+def country_chart(filtered_rollup, by_hour, sketches=None):
+    country_names = {c.alpha_2: c.name for c in pycountry.countries}
+    if by_hour:
+        # Compare time of visit with number of visits by country
+        time_country_visits = rollup_time_counts(filtered_rollup, 'hour', by='Country Code').reset_index(name='Number of Visits')
+        time_country_visits['Country Name'] = time_country_visits['Country Code'].map(country_names)
+        time_country_visits = downsample(time_country_visits, 'hour', 'Number of Visits', by='Country Code')
+        fig = px.line(time_country_visits, x='hour', y='Number of Visits', color='Country Name', title='Number of Visits by Time and Country', height=600, width=600)
+        fig.update_layout(
+            xaxis=dict(
+                tickmode='array',
+                tickvals=list(range(24)),
+                ticktext=[f'{hour:02}:00' for hour in range(24)]
+            )
+        )
+        return fig
+
+    # Number of visits by country visualization
+    if sketches is None:
+        visits_by_country = rollup_counts(filtered_rollup, 'Country Code').reset_index()
+        visits_by_country.columns = ['Country Code', 'Number of Visits']
+    else:
+        visits_by_country = sketches['top countries'].top(SpaceSaving.capacity).rename_axis('Country Code').reset_index()
+        visits_by_country.columns = ['Country Code', 'Number of Visits', 'Overcount']
+    return px.bar(visits_by_country, x='Country Code', y='Number of Visits', title='Number of Visits by Country', **overcount_bars(visits_by_country))
+
+# Function to estimate quantiles of the response sizes and session durations from their t-digests,
+# each with its rank error: the true quantile of the estimate is within that many percentage points
+def quantile_table(sketches):
+    rows = []
+    for column, name in [('Response Size', 'response size'), ('Session Duration', 'session duration')]:
+        for q in (0.5, 0.9, 0.99):
+            digest = sketches[name]
+            rows.append((column, f'{q:.0%}', float(digest.quantile(q)), 100 * digest.rank_error(q)))
+    return pd.DataFrame(rows, columns=['Column', 'Quantile', 'Estimate', 'Rank Error (%)']).set_index(['Column', 'Quantile']).round(2)
+
+# Function to analyze traffic per hour
+def analyze_traffic_per_hour(rollup):
+    # Grouping the hourly counts by hour of the day
+    traffic_per_hour = rollup_time_counts(rollup, 'hour').reset_index()
+    traffic_per_hour = downsample(traffic_per_hour, 'hour', 'count')
+
+    # Plotting traffic per hour
+    fig = px.line(traffic_per_hour, x='hour', y='count', title='Traffic Per Hour')
+    
+    # Customize x-axis labels to display actual hours
+    fig.update_layout(
+        xaxis=dict(
+            title='Hour of the Day',
+            tickmode='array',
+            tickvals=list(range(24)),  # Hourly values from 0 to 23
+            ticktext=[f'{hour:02}:00' for hour in range(24)]  # Format labels as 'hour:00'
+        ),
+        yaxis=dict(title='Traffic Count')
+    )
+
+    return fig
+
+def analyze_traffic_per_day(rollup):
+    # Grouping the hourly counts by day
+    traffic_per_day = rollup_time_counts(rollup, 'day').reset_index()
+    traffic_per_day = downsample(traffic_per_day, 'day', 'count')
+
+    # Plotting traffic per day
+    fig = px.line(traffic_per_day, x='day', y='count', title='Traffic Per Day')
+
+    # Customize x-axis labels
+    fig.update_layout(
+        xaxis=dict(title='Day'),
+        yaxis=dict(title='Traffic Count')
+    )
+
+    return fig
+
+# Function to analyze traffic per week
+def analyze_traffic_per_week(rollup):
+    # Grouping the hourly counts by week
+    traffic_per_week = rollup_time_counts(rollup, 'week').reset_index()
+
+    # Plotting traffic per week
+    fig = px.bar(traffic_per_week, x='week', y='count', title='Traffic Per Week')
+    return fig
+
+# Function to analyze traffic per month
+def analyze_traffic_per_month(rollup):
+    # Grouping the hourly counts by month
+    traffic_per_month = rollup_time_counts(rollup, 'month').reset_index()
+    
+    # Get month names
+    traffic_per_month['month'] = traffic_per_month['month'].apply(lambda x: calendar.month_name[x])
+
+    # Plotting traffic per month
+    fig = px.bar(traffic_per_month, x='month', y='count', title='Traffic Per Month')
+    return fig
+
+# Traffic analyses by option of the "Select analysis option" box
+traffic_analyses = {
+    "Traffic Per Hour": analyze_traffic_per_hour,
+    "Traffic Per Day": analyze_traffic_per_day,
+    "Traffic Per Week": analyze_traffic_per_week,
+    "Traffic Per Month": analyze_traffic_per_month,
+}
+
+# Function to compute the tables of the Exploratory Data Analysis page, without displaying them.
+# The logs are a DataFrame, a SqliteLogView, which answers with SQL queries, or LogAggregates of a CSV file read in chunks
+def eda_statistics(df, rollup):
+    country_names = {c.alpha_2: c.name for c in pycountry.countries}
+    visits_by_hour = rollup_time_counts(rollup, 'hour')
+    return {
+        'describe': describe(df, exclude=['IP Address']),
+        'country_visits': rollup_counts(rollup, 'Country Code').rename(index=country_names),
+        'visits_by_hour': visits_by_hour.set_axis(visits_by_hour.index.map('{:02}:00'.format).rename('Hour')),
+        'visits_by_day': rollup_time_counts(rollup, 'day').rename_axis('Date'),
+        'visits_by_week': rollup_time_counts(rollup, 'week'),
+        'visits_by_month': rollup_time_counts(rollup, 'month'),
+        'page_visits': rollup_counts(rollup, 'page'),
+        'traffic_source_counts': rollup_counts(rollup, 'Traffic Source'),
+        'status_code_counts': rollup_counts(rollup, 'Status Code'),
+        'top_sports_events': value_counts(df, 'Request', ('Section', 'sports')).head(5),
+        'top_sports': group_sizes(df, 'Sports Event').reset_index(name='Interactions').sort_values(by='Interactions', ascending=False),
+        'num_live_streams': row_count(df, ('Section', 'live-stream')),
+        'interactions': value_counts(df, 'Interaction'),
+        'average_durations': mean_by(df, 'Live Stream Sport', 'Session Duration', ('Section', 'live-stream')).rename_axis('Sport').rename('Duration'),
+        'browser_counts': value_counts(df, 'Browser'),
+        'device_counts': value_counts(df, 'Device'),
+    }
+
+# Function for Exploratory Data Analysis
+def perform_eda(df, rollup):
+    with timed('aggregate'):
+        statistics = eda_statistics(df, rollup)
+
+    # Interactive widgets for exploratory data analysis
+    st.title("Exploratory Data Analysis")
+
+    # Display basic statistics
+    st.subheader("OLYMPICS BASIC STATISTICS ")
+    st.write(statistics['describe'])
+
+    # Country of Origin Analysis
+    st.subheader("COUNTRY OF ORIGIN ANALYSIS")
+    country_visits = statistics['country_visits']
+    st.write(country_visits)
+
+    # Total number of visits from all countries
+    total_visits = country_visits.sum()
+    
+    # Display the total number of visits
+    st.write("Total Visits:", total_visits)
+    
+    # Top countries with the highest number of visits
+    top_countries = country_visits.head(5)  # Change 5 to the desired number of top countries
+    st.write("Top 5 Countries with the Highest Number of Visits:")
+    st.write(top_countries)
+
+    #Time Visit Analysis
+    st.subheader("TIME OF VISIT ANALYSIS")
+    # Visits grouped by hour
+    visits_by_hour = statistics['visits_by_hour']
+    
+    # Display the results
+    st.write("Visits by Hour:")
+    st.write(visits_by_hour)
+
+    # Find the hour with the highest number of visits
+    peak_hour = visits_by_hour.idxmax()
+
+    # Get the number of visits during the peak hour
+    peak_hour_visits = visits_by_hour.max()
+
+    # Display the peak hour and the number of visits during that hour
+    st.write(f"The peak period is at {peak_hour} with {peak_hour_visits} visits.")
+    
+    # Visits grouped by day
+    visits_by_day = statistics['visits_by_day']
+     
+    st.write("\nVisits by Day:")
+    st.write(visits_by_day)
+
+    # Find the day with the highest number of visits
+    peak_day = visits_by_day.idxmax()
+    peak_day_visits = visits_by_day.max()
+
+    st.write(f"The peak day is: {peak_day} with {peak_day_visits} visits.")
+
+    # Visits grouped by week
+    visits_by_week = statistics['visits_by_week']
+    st.write("\nVisits by week:")
+    st.write(visits_by_week)
+
+    # Find the week with the highest number of visits
+    peak_week = visits_by_week.idxmax()
+    peak_week_visits = visits_by_week.max()
+
+    st.write(f"The peak week is: week {peak_week} with {peak_week_visits} visits.")
+
+    # Visits grouped by month
+    visits_by_month = statistics['visits_by_month']
+    st.write("\nVisits by month:")
+    st.write(visits_by_month)
+
+    # Find the month with the highest number of visits
+    peak_month_number = int(visits_by_month.idxmax())
+    peak_month_visits = visits_by_month.max()
+    # Convert month number to month name
+    peak_month_name = calendar.month_name[peak_month_number]
+
+    st.write(f"The peak month is in {peak_month_name} with {peak_month_visits} visits.")
+    
+    
+    # Number of Visits Analysis
+    st.subheader("NUMBER OF VISITS ANALYSIS")
+    
+    # Basic summary statistics
+    st.subheader("Basic Statistics")
+    st.write("Average number of visits per day:")
+    st.write(visits_by_day.mean())
+    st.write("Maximum number of visits in a single day:")
+    st.write(visits_by_day.max())
+    st.write("Minimum number of visits in a single day:")
+    st.write(visits_by_day.min())
+   
+
+    # Number of Visits to Each Page
+    st.subheader("Number of Visits to Each Page")
+    page_visits = statistics['page_visits']
+    st.write("Number of Visits to Each Page:")
+    st.write(page_visits)
+
+    # Display popular pages
+    st.subheader("Popular Pages")
+    popular_pages = page_visits.head(5)  # Display the top 5 most visited pages
+    st.write(popular_pages)
+
+    # Traffic source Analysis
+    st.subheader("TRAFFIC SOURCE ANALYSIS")
+    
+    # Basic Statistics for Traffic Sources
+    st.subheader("Basic Statistics for Traffic Sources")
+    traffic_source_counts = statistics['traffic_source_counts']
+    st.write("Number of Visits by Traffic Source:")
+    st.write(traffic_source_counts)
+    st.write("Total Number of Unique Traffic Sources:", len(traffic_source_counts))
+    st.write("Most Common Traffic Source:", traffic_source_counts.idxmax())
+    
+    # Traffic source Analysis
+    st.subheader(" ERROR ANALYSIS")
+    
+    # Distribution of status codes
+    st.subheader("Basic Statistics for Status Codes")
+    
+    # Basic Statistics for Status Codes
+    status_code_counts = statistics['status_code_counts']
+    st.write("Number of Occurrences by Status Code:")
+    st.write(status_code_counts)
+    st.write("Total Number of Unique Status Codes:", len(status_code_counts))
+    st.write("Most Common Status Code:", status_code_counts.idxmax())
+
+    # MAIN INTERESTS ANALYSIS
+
+    st.subheader("Main Interests (Based on Selected/Viewed Sports)")
+
+    # Top sports
+    st.write("Favourites Analysis:")
+    st.write("Top Favourite Sports")
+    st.write(statistics['top_sports_events'])
+
+
+    st.subheader("Top Sports Selected/Viewed")
+    
+    # Display the top viewed or selected sports
+    st.write("Top Viewed/Selected Sports:")
+    st.write(statistics['top_sports'])
+
+    interactions = statistics['interactions']
+
+    # Count the number of live stream sessions, chats, polls, and share reactions
+    num_live_streams = statistics['num_live_streams']
+    num_chats = interactions.get('chat', 0)
+    num_polls = interactions.get('poll', 0)
+    num_share_reactions = interactions.get('share-reaction', 0)
+
+    # Display the results
+    st.subheader("Viewership Analysis")
+    st.write("Number of Live Stream Sessions:", num_live_streams)
+    st.write("Number of Chats:", num_chats)
+    st.write("Number of Polls:", num_polls)
+    st.write("Number of Share Reactions:", num_share_reactions)
+
+    # Display the average duration of live stream sessions for each sport
+    st.subheader("Average Duration of Live Stream Sessions by Sport")
+    st.write(statistics['average_durations'])  
+
+
+    #Analysing user agents
+    st.subheader("USER AGENT ANALYSIS")
+
+    # Display the counts as dataframes
+    st.write("Browser Distribution")
+    st.dataframe(statistics['browser_counts'])
+
+    st.write("Device Distribution")
+    st.dataframe(statistics['device_counts'])
+
+# Function to show in the sidebar how long each stage of this run took. Whatever no stage covers,
+# mostly sending the elements to the browser, is shown as rendering
+def timings_panel(timings, total):
+    stages = pd.Series(timings.seconds, dtype='float64')
+    stages['rendering'] = max(total - stages.sum(), 0.0)
+    stages['total'] = total
+    st.sidebar.subheader("Stage Timings")
+    st.sidebar.dataframe((stages * 1000).round(1).rename_axis('Stage').rename('ms'))
+
+# Main function
+def main():
+    # Taken before loading, so logs arriving during the load are picked up by the next refresh
+    st.session_state['data_signature'] = data_signature(data_source)
+    watch_for_new_logs()
+
+    st.sidebar.image("paris2024.png", caption="PAYRIS FUN OLYMPICS" )
+    selected_page = st.sidebar.radio("Navigation", ["Dashboard", "Exploratory Data Analysis"])
+    show_timings = st.sidebar.checkbox("Show stage timings")
+    # Only offered once fetch_data has written daily sketches
+    approximate = st.sidebar.checkbox("Approximate analytics", disabled=not os.path.isdir(sketch_store),
+                                      help="Answer unique counts, top values and quantiles from daily sketches, with error bounds")
+
+    started = time.perf_counter()
+    with collect_timings() as timings:
+        if selected_page == "Dashboard":
+            # The date pickers and column selection of the previous run decide which days and columns are loaded
+            start_date = st.session_state.get('start_date', generation_start_date)
+            end_date = st.session_state.get('end_date', generation_end_date)
+            selected_columns = st.session_state.get('selected_columns', [])
+            columns = None if 'IP Address' in selected_columns or 'Display all columns' in selected_columns else [column for column in log_columns + derived_columns if column != 'IP Address']
+            cleaned_data = load_and_clean_data(data_source, start_date, end_date, columns)
+            dashboard_page(cleaned_data, load_rollup(data_source, start_date, end_date), approximate)
+        elif selected_page == "Exploratory Data Analysis":
+            df = load_and_clean_data(data_source)
+            perform_eda(df, load_rollup(data_source))
+
+    if show_timings:
+        timings_panel(timings, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    main()
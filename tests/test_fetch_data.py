@@ -0,0 +1,16 @@
+import requests
+from fetch_data import LogApiClient
+
+# Function to build a 200 response with the given body
+def response_with(body):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    return response
+
+def test_invalid_json_from_one_node_is_skipped(monkeypatch):
+    client = LogApiClient(["http://good", "http://bad"])
+    bodies = {"http://good/generate-logs": b'["first", "second"]', "http://bad/generate-logs": b'["trunc'}
+    monkeypatch.setattr(client.session, "get", lambda url, **kwargs: response_with(bodies[url]))
+    assert client.fetch("http://bad") is None
+    assert client.fetch_all() == ["first", "second"]
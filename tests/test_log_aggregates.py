@@ -0,0 +1,67 @@
+from datetime import datetime
+import pandas as pd
+import log_queries
+from log_aggregates import AggregateLogCache, read_log_chunks
+from log_sqlite import time_columns
+from olympic_logs import write_sharded_logs
+
+def test_earlier_aggregates_survive_an_append(tmp_path):
+    path = tmp_path / 'web_logs.csv'
+    write_sharded_logs(str(path), datetime(2024, 5, 30), datetime(2024, 8, 30), 3001, 0, workers=1)
+    cache = AggregateLogCache(64 * 1024)
+    before = cache.load(str(path))
+    view = log_queries.slice_logs(before, '2024-06-01', '2024-06-30')
+    view_rows = len(view)
+
+    appended = tmp_path / 'appended.csv'
+    write_sharded_logs(str(appended), datetime(2024, 5, 30), datetime(2024, 8, 30), 3000, 1, workers=1)
+    with open(path, 'ab') as log_file:
+        log_file.write(appended.read_bytes())
+    after = cache.load(str(path))
+
+    assert len(after) == 6001
+    assert log_queries.value_counts(after, 'Status Code').sum() == 6001
+    # The aggregates handed out before the append, and their views, keep their own totals
+    assert len(before) == 3001
+    assert log_queries.value_counts(before, 'Status Code').sum() == 3001
+    assert log_queries.distinct_count(before, 'Request') <= log_queries.distinct_count(after, 'Request')
+    assert len(view) == view_rows
+    assert log_queries.value_counts(view, 'Status Code').sum() == view_rows
+
+def test_truncated_file_resets_the_aggregates(tmp_path):
+    path = tmp_path / 'web_logs.csv'
+    write_sharded_logs(str(path), datetime(2024, 5, 30), datetime(2024, 8, 30), 1000, 0, workers=1)
+    cache = AggregateLogCache(64 * 1024)
+    assert len(cache.load(str(path))) == 1000
+    version = cache.version
+
+    path.write_bytes(b'')
+    assert len(cache.load(str(path))) == 0
+    assert cache.version > version
+
+def test_removed_file_resets_the_aggregates(tmp_path):
+    path = tmp_path / 'web_logs.csv'
+    write_sharded_logs(str(path), datetime(2024, 5, 30), datetime(2024, 8, 30), 1000, 0, workers=1)
+    cache = AggregateLogCache(64 * 1024)
+    assert len(cache.load(str(path))) == 1000
+    version = cache.version
+
+    path.unlink()
+    assert len(cache.load(str(path))) == 0
+    assert cache.version > version
+    # Nothing changed since, the aggregates handed out stay current
+    version = cache.version
+    cache.load(str(path))
+    assert cache.version == version
+
+def test_described_time_means_match_the_logs(tmp_path):
+    path = tmp_path / 'web_logs.csv'
+    write_sharded_logs(str(path), datetime(2024, 5, 30), datetime(2024, 8, 30), 3000, 0, workers=1)
+    described = AggregateLogCache(64 * 1024).load(str(path)).describe()
+    cleaned_data = pd.concat([chunk for chunk, _, _ in read_log_chunks(str(path), 1 << 30)])
+    for column in time_columns:
+        nanoseconds = [int(value) for value in cleaned_data[column].to_numpy().astype('int64')]
+        exact = pd.Timestamp((2 * sum(nanoseconds) + len(nanoseconds)) // (2 * len(nanoseconds)))
+        assert described.loc['mean', column] == exact
+        # DataFrame.describe averages float nanoseconds, off the exact mean by its rounding only
+        assert abs(described.loc['mean', column] - cleaned_data[column].mean()) < pd.Timedelta(microseconds=1)
@@ -0,0 +1,30 @@
+from datetime import datetime
+from log_rollup import RollupLogCache, rollup_totals
+from olympic_logs import write_sharded_logs
+
+# Function to write count seeded logs to a CSV file
+def write_logs(path, count, seed=0):
+    write_sharded_logs(str(path), datetime(2024, 5, 30), datetime(2024, 8, 30), count, seed, workers=1)
+
+def test_truncated_file_empties_the_cache(tmp_path):
+    path = tmp_path / 'web_logs.csv'
+    write_logs(path, 1001)
+    cache = RollupLogCache(1)
+    assert len(cache.load(str(path))) == 1001
+    assert rollup_totals(cache.rollup())[0] == 1001
+    version = cache.version
+
+    path.write_bytes(b'')
+    assert len(cache.load(str(path))) == 0
+    assert rollup_totals(cache.rollup())[0] == 0
+    assert cache.version > version
+
+def test_rewritten_file_is_parsed_again(tmp_path):
+    path = tmp_path / 'web_logs.csv'
+    write_logs(path, 1001)
+    cache = RollupLogCache(1)
+    cache.load(str(path))
+
+    write_logs(path, 500, seed=1)
+    assert len(cache.load(str(path))) == 500
+    assert rollup_totals(cache.rollup())[0] == 500
@@ -0,0 +1,27 @@
+import pyarrow as pa
+import pytest
+from log_parsing import logs_from_arrow, parse_raw_logs
+from olympic_logs import app
+
+def test_arrow_endpoint_rejects_unknown_compression():
+    response = app.test_client().get('/generate-logs/arrow', query_string={'count': 10, 'compression': 'bogus'})
+    assert response.status_code == 400
+    assert 'compression' in response.get_json()['error']
+
+@pytest.mark.parametrize('compression', [None, 'lz4', 'zstd'])
+def test_arrow_endpoint_streams_record_batches(compression):
+    query = {'count': 10} if compression is None else {'count': 10, 'compression': compression}
+    response = app.test_client().get('/generate-logs/arrow', query_string=query)
+    assert response.status_code == 200
+    assert pa.ipc.open_stream(pa.py_buffer(response.get_data())).read_all().num_rows == 10
+
+def test_arrow_logs_match_the_parsed_lines_of_the_same_seed():
+    client = app.test_client()
+    query = {'count': 2000, 'seed': 7, 'workers': 1}
+    parsed, malformed = parse_raw_logs(client.get('/generate-logs', query_string=query).get_json())
+    table = pa.ipc.open_stream(pa.py_buffer(client.get('/generate-logs/arrow', query_string=query).get_data())).read_all()
+    received = logs_from_arrow(table)
+    assert len(malformed) == 0
+    assert (received.dtypes == parsed.dtypes).all()
+    for column in parsed.columns:
+        assert received[column].astype(object).equals(parsed[column].astype(object)), column